@@ -3,31 +3,76 @@
 from __future__ import annotations
 
 import json
-from functools import cached_property
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Callable, Iterator
 
 import pandas as pd
 
 if TYPE_CHECKING:
     from ost import mol
 
+    from plinder.core.structure.structure import Structure
+
 from biotite.sequence.io.fasta import FastaFile
 
 from plinder.core.index import utils
-from plinder.core.scores.links import query_links
-from plinder.core.structure.structure import Structure
+from plinder.core.scores.links import (
+    empty_links,
+    query_linked_system_ids,
+    query_links,
+)
+from plinder.core.utils.config import get_config
 from plinder.core.utils.cpl import get_plinder_path
 from plinder.core.utils.io import (
     download_alphafold_cif_file,
     download_pdb_chain_cif_file,
 )
 from plinder.core.utils.log import setup_logger
-from plinder.core.utils.unpack import get_zips_to_unpack
+from plinder.core.utils.unpack import _download_lock, get_zips_to_unpack
 
 LOG = setup_logger(__name__)
 
 
+@lru_cache(maxsize=1024)
+def _load_entry(pdb_id: str, prune: bool, plinder_dir: str) -> dict[str, Any]:
+    # systems of the same pdb_id share their entry, and DataLoader
+    # workers revisit entries every epoch, so parse each entry JSON
+    # once per process. plinder_dir is part of the key so that a
+    # change of configuration does not return stale entries
+    entry: dict[str, Any] = utils.load_entries(pdb_ids=[pdb_id], prune=prune)[pdb_id]
+    return entry
+
+
+@lru_cache(maxsize=None)
+def _json_loads() -> Callable[[bytes], Any]:
+    # orjson parses noticeably faster when available, otherwise
+    # fall back to the standard library (which also accepts bytes)
+    try:
+        import orjson
+
+        loads: Callable[[bytes], Any] = orjson.loads
+    except ImportError:
+        loads = json.loads
+    return loads
+
+
+def _iter_files(root: Path | str) -> Iterator[str]:
+    # scandir entries carry the file type from the directory listing,
+    # so (unlike rglob + is_file) no extra stat call is needed per path
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path
+
+
 class PlinderSystem:
     """
     Core class for interacting with a single system and its assets.
@@ -49,15 +94,18 @@ class PlinderSystem:
         self.system_id: str = system_id
         self.prune: bool = prune
         self.skip_3d_confgen: bool = skip_3d_confgen
-        self._entry: dict[str, Any] | None = None
-        self._system: dict[str, Any] | None = None
-        self._archive: Path | None = None
-        self._chain_mapping: dict[str, Any] | None = None
-        self._water_mapping: dict[str, Any] | None = None
         self._linked_structures: pd.DataFrame | None = None
-        self._linked_archive: Path | None = None
 
-    @property
+    def __getstate__(self) -> dict[str, Any]:
+        # openstructure handles can not be pickled, drop them so
+        # that systems can be shipped to DataLoader workers; they
+        # are lazily reloaded on first access
+        state = self.__dict__.copy()
+        for attr in ["receptor_entity", "ligand_views"]:
+            state.pop(attr, None)
+        return state
+
+    @cached_property
     def entry(self) -> dict[str, Any] | None:
         """
         Store a reference to the entry JSON for this system
@@ -67,16 +115,15 @@ class PlinderSystem:
         dict[str, Any] | None
             entry JSON
         """
-        if self._entry is None:
-            entry_pdb_id = self.system_id.split("__")[0]
-            try:
-                entry = utils.load_entries(pdb_ids=[entry_pdb_id], prune=self.prune)
-                self._entry = entry[entry_pdb_id]
-            except KeyError:
-                raise ValueError(f"pdb_id={entry_pdb_id} not found in entries")
-        return self._entry
+        entry_pdb_id = self.system_id.split("__")[0]
+        try:
+            return _load_entry(
+                entry_pdb_id, self.prune, str(get_config().data.plinder_dir)
+            )
+        except KeyError:
+            raise ValueError(f"pdb_id={entry_pdb_id} not found in entries")
 
-    @property
+    @cached_property
     def system(self) -> dict[str, Any] | None:
         """
         Return the system metadata from the original entry JSON
@@ -86,15 +133,14 @@ class PlinderSystem:
         dict[str, Any] | None
             system metadata
         """
-        if self._system is None:
-            try:
-                assert self.entry is not None
-                self._system = self.entry["systems"][self.system_id]
-            except KeyError:
-                raise ValueError(f"system_id={self.system_id} not found in entry")
-        return self._system
+        try:
+            assert self.entry is not None
+            system: dict[str, Any] = self.entry["systems"][self.system_id]
+            return system
+        except KeyError:
+            raise ValueError(f"system_id={self.system_id} not found in entry")
 
-    @property
+    @cached_property
     def archive(self) -> Path | None:
         """
         Return the path to the directory containing the plinder system
@@ -104,15 +150,14 @@ class PlinderSystem:
         Path | None
             directory containing the plinder system
         """
-        if self._archive is None:
-            zips = get_zips_to_unpack(kind="systems", system_ids=[self.system_id])
-            [archive] = list(zips.keys())
-            self._archive = archive.parent / self.system_id
-            if not self._archive.is_dir():
-                raise ValueError(f"system_id={self.system_id} not found in systems")
-        return self._archive
+        zips = get_zips_to_unpack(kind="systems", system_ids=[self.system_id])
+        [archive] = list(zips.keys())
+        system_dir = archive.parent / self.system_id
+        if not system_dir.is_dir():
+            raise ValueError(f"system_id={self.system_id} not found in systems")
+        return system_dir
 
-    @property
+    @cached_property
     def system_cif(self) -> str:
         """
         Path to the system.cif file
@@ -123,9 +168,9 @@ class PlinderSystem:
             path
         """
         assert self.archive is not None
-        return (self.archive / "system.cif").as_posix()
+        return sys.intern((self.archive / "system.cif").as_posix())
 
-    @property
+    @cached_property
     def receptor_cif(self) -> str:
         """
         Path to the receptor.cif file
@@ -136,9 +181,9 @@ class PlinderSystem:
             path
         """
         assert self.archive is not None
-        return (self.archive / "receptor.cif").as_posix()
+        return sys.intern((self.archive / "receptor.cif").as_posix())
 
-    @property
+    @cached_property
     def receptor_pdb(self) -> str:
         """
         Path to the receptor.pdb file
@@ -149,9 +194,9 @@ class PlinderSystem:
             path
         """
         assert self.archive is not None
-        return (self.archive / "receptor.pdb").as_posix()
+        return sys.intern((self.archive / "receptor.pdb").as_posix())
 
-    @property
+    @cached_property
     def sequences_fasta(self) -> str:
         """
         Path to the sequences.fasta file
@@ -162,7 +207,7 @@ class PlinderSystem:
             path
         """
         assert self.archive is not None
-        return (self.archive / "sequences.fasta").as_posix()
+        return sys.intern((self.archive / "sequences.fasta").as_posix())
 
     @cached_property
     def sequences(self) -> dict[str, str]:
@@ -177,7 +222,7 @@ class PlinderSystem:
         assert self.archive is not None
         return {k: v for k, v in FastaFile.read_iter(self.sequences_fasta)}
 
-    @property
+    @cached_property
     def chain_mapping(self) -> dict[str, Any] | None:
         """
         Chain mapping metadata
@@ -187,13 +232,13 @@ class PlinderSystem:
         dict[str, Any] | None
             chain mapping
         """
-        if self._chain_mapping is None:
-            assert self.archive is not None
-            with (self.archive / "chain_mapping.json").open() as f:
-                self._chain_mapping = json.load(f)
-        return self._chain_mapping
+        assert self.archive is not None
+        chain_mapping: dict[str, Any] = _json_loads()(
+            (self.archive / "chain_mapping.json").read_bytes()
+        )
+        return chain_mapping
 
-    @property
+    @cached_property
     def water_mapping(self) -> dict[str, Any] | None:
         """
         Water mapping metadata
@@ -203,16 +248,16 @@ class PlinderSystem:
         dict[str, Any] | None
             water mapping
         """
-        if self._water_mapping is None:
-            assert self.archive is not None
-            try:
-                with (self.archive / "water_mapping.json").open() as f:
-                    self._water_mapping = json.load(f)
-            except FileNotFoundError:
-                return None
-        return self._water_mapping
+        assert self.archive is not None
+        try:
+            water_mapping: dict[str, Any] = _json_loads()(
+                (self.archive / "water_mapping.json").read_bytes()
+            )
+        except FileNotFoundError:
+            return None
+        return water_mapping
 
-    @property
+    @cached_property
     def ligand_sdfs(self) -> dict[str, str]:
         """
         Return a dictionary of ligand names to paths to ligand sdf files
@@ -223,12 +268,17 @@ class PlinderSystem:
             dictionary of ligand names to paths to ligand sdf files
         """
         assert self.archive is not None
-        ligands = {}
-        for ligand in (self.archive / "ligand_files/").glob("*.sdf"):
-            ligands[ligand.stem] = ligand.as_posix()
-        return ligands
+        try:
+            with os.scandir(self.archive / "ligand_files") as entries:
+                return {
+                    entry.name[: -len(".sdf")]: entry.path
+                    for entry in entries
+                    if entry.name.endswith(".sdf")
+                }
+        except FileNotFoundError:
+            return {}
 
-    @property
+    @cached_property
     def structures(self) -> list[str]:
         """
         Return a list of paths to all structures in the plinder system
@@ -239,7 +289,7 @@ class PlinderSystem:
             list of paths to structures
         """
         assert self.archive is not None
-        return [path.as_posix() for path in self.archive.rglob("*") if path.is_file()]
+        return list(_iter_files(self.archive))
 
     @property
     def linked_structures(self) -> pd.DataFrame | None:
@@ -255,11 +305,64 @@ class PlinderSystem:
             dataframe of linked structures if present in plinder
         """
         if self._linked_structures is None:
-            links = query_links(filters=[("reference_system_id", "==", self.system_id)])
-            self._linked_structures = links
+            if self.system_id not in query_linked_system_ids():
+                # most systems have no links, skip querying for them
+                self._linked_structures = empty_links()
+            else:
+                self._linked_structures = query_links(
+                    filters=[("reference_system_id", "==", self.system_id)]
+                )
         return self._linked_structures
 
-    @property
+    def best_linked_structures_ids(self, topn: int = 1) -> dict[str, list[str]]:
+        """
+        Return the ids of the best scoring linked structures of each kind.
+        apo and holo links are ranked by resolution (lower is better) and
+        pred links by pLDDT (higher is better), as in save_linked_structures.
+
+        Parameters
+        ----------
+        topn : int, default=1
+            number of linked structures to return per kind
+
+        Returns
+        -------
+        dict[str, list[str]]
+            best linked structure ids keyed by link kind
+        """
+        links = self.linked_structures
+        if links is None or not len(links):
+            return {}
+        best = {}
+        for kind, group in links.groupby("kind", sort=False):
+            if kind == "pred":
+                top = group.nlargest(topn, "sort_score")
+            else:
+                top = group.nsmallest(topn, "sort_score")
+            best[kind] = top["id"].tolist()
+        return best
+
+    def best_linked_structures_paths(self, topn: int = 1) -> dict[str, dict[str, str]]:
+        """
+        Return the paths to the best scoring linked structures of each kind.
+        Reuses linked_structures rather than querying the links again.
+
+        Parameters
+        ----------
+        topn : int, default=1
+            number of linked structures to return per kind
+
+        Returns
+        -------
+        dict[str, dict[str, str]]
+            paths to the best linked structures keyed by link kind and id
+        """
+        return {
+            kind: {id: self.get_linked_structure(kind, id) for id in ids}
+            for kind, ids in self.best_linked_structures_ids(topn=topn).items()
+        }
+
+    @cached_property
     def linked_archive(self) -> Path | None:
         """
         Path to linked structures archive if it exists
@@ -269,16 +372,13 @@ class PlinderSystem:
         Path | None
             path to linked structures archive
         """
-        if self._linked_archive is None:
+        zips = get_zips_to_unpack(kind="linked_structures")
+        if not len(zips):
+            LOG.info("no linked_structures found, downloading now, stand by")
+            get_plinder_path(rel="linked_structures")
             zips = get_zips_to_unpack(kind="linked_structures")
-            if not len(zips):
-                LOG.info("no linked_structures found, downloading now, stand by")
-                get_plinder_path(rel="linked_structures")
-                zips = get_zips_to_unpack(kind="linked_structures")
-            archive = list(zips.keys())[0]
-            self._linked_archive = archive.parent
-
-        return self._linked_archive
+        archive = list(zips.keys())[0]
+        return archive.parent
 
     def get_linked_structure(self, link_kind: str, link_id: str) -> str:
         """
@@ -296,31 +396,55 @@ class PlinderSystem:
         str
             path to linked structure
         """
+        if (link_kind, link_id) in self._linked_structure_paths:
+            return self._linked_structure_paths[link_kind, link_id]
         if self.linked_archive is None:
             raise ValueError("linked_archive is None!")
         allowed = ["apo", "pred", "holo"]
         assert link_kind in allowed, f"link_kind={link_kind} not in {allowed}"
         structure = self.linked_archive / f"{link_id}.cif"
         if not structure.is_file():
-            if link_kind == "apo":
-                pdb_id, chain_id = link_id.split("_")
-                try:
-                    download_pdb_chain_cif_file(pdb_id, chain_id, structure)
-                except Exception as e:
-                    raise ValueError(f"Unable to download {link_id}! {str(e)}")
-            elif link_kind == "pred":
-                uniprot_id = link_id.split("_")[0]
+            with _download_lock(structure.as_posix()):
+                # another thread may have fetched it while this one waited
+                if not structure.is_file():
+                    structure = self._fetch_linked_structure(
+                        link_kind, link_id, structure
+                    )
+        path = sys.intern(structure.as_posix())
+        self._linked_structure_paths[link_kind, link_id] = path
+        return path
+
+    def _fetch_linked_structure(
+        self, link_kind: str, link_id: str, structure: Path
+    ) -> Path:
+        # download (or locate) a linked structure missing from the archive
+        assert self.linked_archive is not None
+        if link_kind == "apo":
+            pdb_id, chain_id = link_id.split("_")
+            try:
+                download_pdb_chain_cif_file(pdb_id, chain_id, structure)
+            except Exception as e:
+                raise ValueError(f"Unable to download {link_id}! {str(e)}")
+        elif link_kind == "pred":
+            uniprot_id = link_id.split("_")[0]
+            # links of the same uniprot id share the downloaded model file
+            with _download_lock(f"{self.linked_archive}/AF-{uniprot_id}"):
                 cif_file_path = download_alphafold_cif_file(
                     uniprot_id, self.linked_archive
                 )
                 if cif_file_path is None:
                     raise ValueError(f"Unable to download {link_id}")
                 cif_file_path.rename(structure)
-            elif link_kind == "holo":
-                structure = Path(PlinderSystem(system_id=link_id).receptor_cif)
-            if structure is None or not structure.is_file():
-                raise ValueError(f"structure={structure} does not exist!")
-        return structure.as_posix()
+        elif link_kind == "holo":
+            structure = Path(PlinderSystem(system_id=link_id).receptor_cif)
+        if structure is None or not structure.is_file():
+            raise ValueError(f"structure={structure} does not exist!")
+        return structure
+
+    @cached_property
+    def _linked_structure_paths(self) -> dict[tuple[str, str], str]:
+        # paths resolved by get_linked_structure, keyed by (link_kind, link_id)
+        return {}
 
     @cached_property
     def receptor_entity(self) -> "mol.EntityHandle":
@@ -389,19 +513,31 @@ class PlinderSystem:
         # TODO: do we want to keep this as assertion?
         # better if then raise?
         assert self.linked_structures is not None
-
+        # deferred so that index-only users do not pay for importing rdkit
+        from plinder.core.structure.structure import Structure
+
+        ids = self.linked_structures["id"].tolist()
+        kinds = self.linked_structures["kind"].tolist()
+        if not len(ids):
+            return {}
+        # cached_property is not thread safe, so resolve the shared state
+        # here rather than having every worker thread race to fill it
+        # (and possibly download the linked structures archive)
+        _ = self.linked_archive, self._linked_structure_paths, self.sequences
+        # resolving a link is I/O bound (file checks and possibly
+        # downloads), so fetch the paths concurrently and parse each
+        # structure as soon as its path is available, overlapping the
+        # parsing with the remaining downloads
         structures = {}
-        for id, kind in self.linked_structures[["id", "kind"]].values:
-            protein_path = self.get_linked_structure(
-                kind,
-                id,
-            )
-            structures[id] = Structure(
-                id=id,
-                protein_path=Path(protein_path),
-                protein_sequence=self.sequences,
-                structure_type=kind,
-            )
+        with ThreadPoolExecutor(max_workers=min(8, len(ids))) as executor:
+            protein_paths = executor.map(self.get_linked_structure, kinds, ids)
+            for id, kind, protein_path in zip(ids, kinds, protein_paths):
+                structures[id] = Structure(
+                    id=id,
+                    protein_path=Path(protein_path),
+                    protein_sequence=self.sequences,
+                    structure_type=kind,
+                )
         return structures
 
     @property
@@ -409,6 +545,8 @@ class PlinderSystem:
         """
         Load holo structure
         """
+        from plinder.core.structure.structure import Structure
+
         return Structure(
             id=self.system_id,
             protein_path=Path(self.receptor_cif),
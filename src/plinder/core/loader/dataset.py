@@ -2,22 +2,91 @@
 # Distributed under the terms of the Apache License 2.0
 from __future__ import annotations
 
+import os
+import pickle
+from collections import OrderedDict
+from functools import partial
+from hashlib import md5
+from pathlib import Path
 from typing import Any, Callable
 
+import numpy as np
 import pandas as pd
-import torch
+from numpy.typing import NDArray
 from torch.utils.data import DataLoader, Dataset
 
+from plinder import __version__
 from plinder.core.index.system import PlinderSystem
 from plinder.core.loader.featurizer import structure_featurizer
 from plinder.core.loader.utils import collate_batch
-from plinder.core.scores import query_index
+from plinder.core.scores import query_index, query_links_bulk
 from plinder.core.scores.query import FILTERS
 from plinder.core.structure.structure import Structure
+from plinder.core.utils.config import get_config
 from plinder.core.utils.log import setup_logger
 
 LOG = setup_logger(__name__)
 
+# leaves the features unpadded, as one array per chain, for collate_batch
+# to pad once per batch; pass featurizer=per_chain_featurizer to opt in
+per_chain_featurizer = partial(structure_featurizer, pad=False)
+
+
+_SYSTEM_IDS: dict[tuple[str, ...], NDArray[np.object_]] = {}
+
+
+def _get_system_ids(split: str, filters: FILTERS) -> NDArray[np.object_]:
+    """
+    Unique system ids of a split, shared between datasets
+    created with the same split and filters (of the same index)
+    """
+    cfg = get_config()
+    # the resolved index and split files are part of the key so that
+    # a change of configuration does not return the ids of another index
+    key = (
+        str(cfg.data.plinder_dir),
+        cfg.data.index_file,
+        cfg.data.split_file,
+        split,
+        repr(filters),
+    )
+    if key not in _SYSTEM_IDS:
+        index = query_index(splits=[split], filters=filters)
+        # the categories are the unique system ids, stored as a
+        # compact numpy array rather than a list of python strings
+        system_ids = index["system_id"].astype("category")
+        ids = system_ids.cat.categories.to_numpy(copy=False)
+        ids.flags.writeable = False
+        _SYSTEM_IDS[key] = ids
+    return _SYSTEM_IDS[key]
+
+
+def _callable_name(fn: Callable[..., Any] | None) -> str:
+    # a stable name for functions and partials; other callables fall
+    # back to their repr, which at worst never hits the cache
+    if isinstance(fn, partial):
+        return f"{_callable_name(fn.func)}(*{fn.args!r}, **{fn.keywords!r})"
+    if fn is not None and hasattr(fn, "__qualname__"):
+        return f"{fn.__module__}.{fn.__qualname__}"
+    return repr(fn)
+
+
+def _item_cache_key(
+    featurizer: Callable[..., Any] | None, use_alternate_structures: bool
+) -> str:
+    """
+    Hash of everything that determines a cached item, used as the cache
+    subdirectory so that a cache_dir shared between configurations,
+    plinder releases or package versions never serves stale items
+    """
+    settings = (
+        __version__,
+        str(get_config().data.plinder_dir),
+        _callable_name(featurizer),
+        use_alternate_structures,
+    )
+    return md5(repr(settings).encode()).hexdigest()
+
 
 class PlinderDataset(Dataset):  # type: ignore
     """
@@ -31,10 +100,22 @@ class PlinderDataset(Dataset):  # type: ignore
         Index filter to select specific system ids
     use_alternate_structures: bool, default=True
         Whether to load alternate structures
-    featurizer: Callable[
-            [Structure, int], dict[str, torch.Tensor]
-    ] = structure_featurizer,
-        Transformation to turn structure to input tensors
+    featurizer: Callable[[Structure], dict[str, Any]] | None, default=structure_featurizer
+        Transformation to turn structure to input features, either padded
+        tensors (structure_featurizer) or per-chain arrays
+        (per_chain_featurizer), which collate_batch pads per batch.
+        None skips featurization
+    cache_dir : Path | str | None, default=None
+        If provided, fully loaded items are pickled to this directory
+        keyed by system_id and re-used on subsequent access (e.g. in
+        later epochs), skipping structure parsing and featurization.
+        Items live in a subdirectory named by a hash of the featurizer,
+        use_alternate_structures, the plinder dataset and the package
+        version, so other configurations do not reuse them
+    system_cache_size : int, default=16
+        Number of recently loaded PlinderSystem instances (with their
+        parsed structures) kept by this dataset and re-used when a system
+        is revisited. 0 disables the cache
     """
 
     def __init__(
@@ -42,18 +123,37 @@ class PlinderDataset(Dataset):  # type: ignore
         split: str,
         filters: FILTERS = None,
         use_alternate_structures: bool = True,
-        featurizer: Callable[
-            [Structure], torch.Tensor | dict[str, torch.Tensor]
-        ] = structure_featurizer,
+        featurizer: Callable[[Structure], dict[str, Any]] | None = structure_featurizer,
+        cache_dir: Path | str | None = None,
+        system_cache_size: int = 16,
         **kwargs: Any,
     ):
-        index = query_index(splits=[split], filters=filters)
-        LOG.info(f"Loading {index.system_id.nunique()} systems")
-        self._system_ids = list(set(index["system_id"]))
+        self._system_ids = _get_system_ids(split, filters)
+        LOG.info(f"Loading {len(self._system_ids)} systems")
         self._num_examples = len(self._system_ids)
 
         self._featurizer = featurizer
         self._use_alternate_structures = use_alternate_structures
+        self._cache_dir: Path | None = None
+        if cache_dir is not None:
+            self._cache_dir = Path(cache_dir) / _item_cache_key(
+                featurizer, use_alternate_structures
+            )
+            self._cache_dir.mkdir(exist_ok=True, parents=True)
+        self._links: dict[str, pd.DataFrame] | None = None
+        self._system_cache_size = system_cache_size
+        self._systems: OrderedDict[str, PlinderSystem] = OrderedDict()
+
+    def preload_links(self) -> dict[str, pd.DataFrame]:
+        """
+        Fetch the linked structures of every system in the dataset
+        with a single query, rather than one query per item. Done on
+        the first item loaded with alternate structures, or call it
+        before creating a DataLoader to share the result with workers
+        """
+        if self._links is None:
+            self._links = query_links_bulk(system_ids=self._system_ids.tolist())
+        return self._links
 
     def __len__(self) -> int:
         return self._num_examples
@@ -63,7 +163,42 @@ class PlinderDataset(Dataset):  # type: ignore
     ) -> dict[str, int | str | pd.DataFrame | dict[str, str | pd.DataFrame]]:
         if not 0 <= index < self._num_examples:
             raise IndexError(index)
-        s = PlinderSystem(system_id=self._system_ids[index])
+        system_id = self._system_ids[index]
+        if self._cache_dir is None:
+            return self._load_item(system_id)
+        cached = self._cache_dir / f"{system_id}.pkl"
+        if cached.is_file():
+            with cached.open("rb") as f:
+                item: dict[str, Any] = pickle.load(f)
+            return item
+        item = self._load_item(system_id)
+        # write to a temporary file first so that concurrent
+        # workers never read a partially written cache entry
+        tmp = cached.parent / f"{cached.name}.{os.getpid()}.tmp"
+        with tmp.open("wb") as f:
+            pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(cached)
+        return item
+
+    def _get_system(self, system_id: str) -> PlinderSystem:
+        """
+        Re-use the PlinderSystem instances (and their cached properties)
+        of the most recently loaded systems, evicting the oldest
+        """
+        if system_id in self._systems:
+            self._systems.move_to_end(system_id)
+            return self._systems[system_id]
+        system = PlinderSystem(system_id=system_id)
+        if self._system_cache_size > 0:
+            self._systems[system_id] = system
+            if len(self._systems) > self._system_cache_size:
+                self._systems.popitem(last=False)
+        return system
+
+    def _load_item(self, system_id: str) -> dict[str, Any]:
+        s = self._get_system(system_id)
+        if self._use_alternate_structures:
+            s._linked_structures = self.preload_links()[system_id]
 
         holo_structure = s.holo_structure
         features_and_coords = None
@@ -91,6 +226,37 @@ def get_torch_loader(
     collate_fn: Callable[[list[dict[str, Any]]], dict[str, Any]] = collate_batch,
     **kwargs: Any,
 ) -> DataLoader[PlinderDataset]:
+    """
+    Create a torch DataLoader over a PlinderDataset
+
+    Parameters
+    ----------
+    dataset : PlinderDataset
+        the dataset to load from
+    batch_size : int, default=2
+        the number of systems per batch
+    shuffle : bool, default=True
+        whether to shuffle the systems each epoch
+    sampler : Sampler, default=None
+        optional sampler to draw systems with
+    num_workers : int, default=1
+        number of worker processes. Items are loaded independently
+        so throughput scales with workers; each worker opens its
+        own duckdb connection. Passing persistent_workers=True in
+        kwargs keeps workers (and their PlinderSystem caches) alive
+        across epochs instead of rebuilding them every epoch.
+    collate_fn : Callable, default=collate_batch
+        function used to merge items into a batch
+    kwargs : Any
+        passed through to DataLoader, e.g. pin_memory=True to have
+        batches collated into page-locked memory for faster
+        non-blocking host to GPU copies
+
+    Returns
+    -------
+    DataLoader[PlinderDataset]
+        the data loader
+    """
     return DataLoader(
         dataset,
         batch_size=batch_size,
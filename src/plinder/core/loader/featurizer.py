@@ -1,9 +1,15 @@
-from typing import Any
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable
 
-import torch
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+from rdkit import Chem, rdBase
 
-from plinder.core.loader.utils import pad_and_stack
+from plinder.core.loader.utils import _maybe_fast_stack
 from plinder.core.structure.atoms import (
+    _chain_index_map,
     _one_hot_encode_stack,
     _stack_atom_array_features,
     _stack_ligand_feat,
@@ -13,14 +19,80 @@ from plinder.core.structure.structure import Structure
 from plinder.core.utils import constants as pc
 
 
-def structure_featurizer(structure: Structure, pad_value: int = -100) -> dict[str, Any]:
+def _ligand_features(
+    structure: Structure,
+    ligand_templates: dict[str, Chem.Mol],
+    cache_dir: Path | None = None,
+) -> dict[str, NDArray[np.int_]]:
+    """
+    Featurize the 2D ligand templates, which are fully determined by
+    the input SMILES. If cache_dir is given the features are stored
+    there per structure, and re-used by later calls (e.g. epochs).
+    The rdkit version is part of the file name so that a changed
+    featurization invalidates the cache.
+    """
+    cached = None
+    if cache_dir is not None:
+        cached = cache_dir / f"{structure.id}.rdkit-{rdBase.rdkitVersion}.npz"
+        if cached.is_file():
+            with np.load(cached) as data:
+                features = {ch: data[ch] for ch in data.files}
+            if features.keys() == ligand_templates.keys():
+                return features
+    if len(ligand_templates) > 1:
+        # featurize the ligand chains of multi-ligand systems concurrently
+        with ThreadPoolExecutor(max_workers=min(8, len(ligand_templates))) as ex:
+            features = dict(
+                zip(
+                    ligand_templates.keys(),
+                    ex.map(lig_atom_featurizer, ligand_templates.values()),
+                )
+            )
+    else:
+        features = {
+            ch: lig_atom_featurizer(ligand_mol)
+            for ch, ligand_mol in ligand_templates.items()
+        }
+    if cached is not None:
+        cached.parent.mkdir(exist_ok=True, parents=True)
+        # write to a temporary file first so that concurrent
+        # workers never read a partially written cache entry
+        tmp = cached.parent / f"{cached.name}.{os.getpid()}.tmp"
+        with tmp.open("wb") as f:
+            np.savez(f, **features)
+        tmp.replace(cached)
+    return features
+
+
+def structure_featurizer(
+    structure: Structure,
+    pad_value: int = -100,
+    multiple_of: int = 8,
+    ligand_cache_dir: Path | str | None = None,
+    pad: bool = True,
+) -> dict[str, Any]:
+    """
+    Featurize a structure into per-chain protein and ligand features.
+    By default every feature is padded and stacked into a [C, N, ...]
+    tensor, with N rounded up to multiple_of. With pad=False every
+    feature is instead a list with one numpy array per chain (in
+    protein / ligand chain order), which collate_complex pads once
+    for the whole batch.
+    """
     # This must be used to order the chain features
     protein_chain_order = structure.protein_chain_ordered
     ligand_chain_order = structure.ligand_chain_ordered
     protein_atom_array = structure.protein_atom_array
-    sequence_atom_mask_stacked = structure.sequence_atom_mask
-    input_sequence_residue_mask_stacked = structure.input_sequence_residue_mask_stacked
-    protein_coordinates_stacked = structure.protein_coords
+    # locate the atoms of every chain once, shared by all per-chain features
+    chain_index_map = _chain_index_map(protein_atom_array, protein_chain_order)
+    # residue and atom masks share one sequence alignment per chain
+    (
+        input_sequence_residue_mask_stacked,
+        sequence_atom_mask_stacked,
+    ) = structure.sequence_masks_stacked
+    protein_coordinates_stacked = _stack_atom_array_features(
+        protein_atom_array, "coord", protein_chain_order, chain_index_map
+    )
     protein_calpha_coordinates_stacked = structure.protein_calpha_coords
     input_ligand_templates = (
         structure.input_ligand_templates
@@ -43,40 +115,32 @@ def structure_featurizer(structure: Structure, pad_value: int = -100) -> dict[st
 
     # Get residue type feature
     protein_structure_residue_type_arr = _stack_atom_array_features(
-        protein_atom_array, "res_name", protein_chain_order
+        protein_atom_array, "res_name", protein_chain_order, chain_index_map
+    )
+    protein_structure_residue_type_stack = _one_hot_encode_stack(
+        protein_structure_residue_type_arr, pc.AA_TO_INDEX, "UNK"
     )
-    protein_structure_residue_type_stack = [
-        feat
-        for feat in _one_hot_encode_stack(
-            protein_structure_residue_type_arr, pc.AA_TO_INDEX, "UNK"
-        )
-    ]
     # TODO: Fix issues with ligands conformer generation
     # Featurize and stack ligand chains
     # VO: try passing the 2D - does not need a conformer!
-    input_conformer_ligand_feat = {
-        ch: lig_atom_featurizer(ligand_mol)
-        for ch, ligand_mol in input_ligand_templates.items()
-    }
+    input_conformer_ligand_feat = _ligand_features(
+        structure,
+        input_ligand_templates,
+        None if ligand_cache_dir is None else Path(ligand_cache_dir),
+    )
     # Stack in ligand_chain_order order
-    input_conformer_ligand_feat_stack = [
-        feats
-        for feats in _stack_ligand_feat(input_conformer_ligand_feat, ligand_chain_order)
-    ]
-
-    input_conformer_ligand_coords_stack = [
-        coord
-        for coord in _stack_ligand_feat(
-            input_ligand_conformers_coords, ligand_chain_order
-        )
-    ]
+    input_conformer_ligand_feat_stack = _stack_ligand_feat(
+        input_conformer_ligand_feat, ligand_chain_order
+    )
+    input_conformer_ligand_coords_stack = _stack_ligand_feat(
+        input_ligand_conformers_coords, ligand_chain_order
+    )
 
     # Get resolved ligand mols coordinate
-    resolved_ligand_mols_coords_stack = [
-        coord
-        for coord in _stack_ligand_feat(resolved_ligand_mols_coords, ligand_chain_order)
-    ]
-    features = {
+    resolved_ligand_mols_coords_stack = _stack_ligand_feat(
+        resolved_ligand_mols_coords, ligand_chain_order
+    )
+    features: dict[str, Iterable[ArrayLike]] = {
         "sequence_atom_mask_feature": sequence_atom_mask_stacked,
         "input_sequence_residue_mask_feature": input_sequence_residue_mask_stacked,
         "protein_coordinates": protein_coordinates_stacked,
@@ -88,13 +152,19 @@ def structure_featurizer(structure: Structure, pad_value: int = -100) -> dict[st
         "resolved_ligand_mols_feature": resolved_ligand_mols_coords_stack,
     }
 
-    # Pad tensors to make chains have equal length
+    if not pad:
+        # leave padding to collate_complex, which writes the per-chain
+        # arrays of a whole batch into a single preallocated tensor
+        return {
+            feat_name: [np.asarray(feat_per_chain) for feat_per_chain in feat]
+            for feat_name, feat in features.items()
+        }
+
+    # Pad tensors to make chains have equal length, rounded up
+    # to multiple_of residues / atoms. Chains that already have the
+    # padded shape are stacked directly without padding
     padded_features = {
-        feat_name: pad_and_stack(
-            [torch.tensor(feat_per_chain) for feat_per_chain in feat],
-            dim=0,
-            value=pad_value,
-        )
+        feat_name: _maybe_fast_stack(feat, value=pad_value, multiple_of=multiple_of)
         for feat_name, feat in features.items()
     }
 
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import warnings
 from pathlib import Path
-from typing import Sequence
+from typing import Any, Iterable, Mapping, Sequence
 
+import numpy as np
 import torch
+from numpy.typing import ArrayLike, NDArray
 from torch import Tensor
 
 from plinder.core.structure.structure import Structure
@@ -11,6 +14,11 @@ from plinder.core.structure.structure import Structure
 PAD_VALUE = -100
 
 
+def _as_tensor(x: ArrayLike) -> Tensor:
+    """Wrap an array (or nested list) as a tensor, sharing memory with numpy arrays where possible."""
+    return torch.from_numpy(np.ascontiguousarray(x))
+
+
 def pad_to_max_length(
     mat: Tensor,
     max_length: int | Sequence[int] | Tensor,
@@ -71,6 +79,8 @@ def pad_and_stack(
     dim: int = 0,
     dims_to_pad: list[int] | None = None,
     value: int | float | None = None,
+    multiple_of: int = 1,
+    pin_memory: bool = False,
 ) -> Tensor:
     """Pads a list of tensors to the maximum length observed along each dimension and then stacks them along a new dimension (given by `dim`).
 
@@ -79,6 +89,9 @@ def pad_and_stack(
         dim (int): The new dimension to stack along.
         dims_to_pad (list[int] | None): The dimensions to pad
         value (int | float | None, optional): The value to pad with, by default None
+        multiple_of (int): Round the padded length of `dims_to_pad` up to a multiple of this value, by default 1
+        pin_memory (bool): Return the result in page-locked memory (when CUDA is available) so that
+            a subsequent `.to(device, non_blocking=True)` can overlap with compute, by default False
 
     Returns:
         Tensor: The padded and stacked tensor. Below are examples of input and output shapes
@@ -102,30 +115,200 @@ def pad_and_stack(
     shapes = torch.tensor([t.shape for t in tensors])
     envelope = shapes.max(dim=0).values
     max_length = envelope[dims_to_pad]
+    if multiple_of > 1:
+        max_length = (max_length + multiple_of - 1) // multiple_of * multiple_of
+
+    if dim == 0 and all(
+        (shapes[:, i] == envelope[i]).all()
+        for i in range(tensors[0].ndim)
+        if i not in dims_to_pad
+    ):
+        # stacking along a new leading dimension is exactly what padding
+        # a nested tensor does, in a single allocation
+        output_size = envelope.clone()
+        output_size[dims_to_pad] = max_length
+        stacked = _nested_to_padded(
+            tensors,
+            0 if value is None else value,
+            [len(tensors), *output_size.tolist()],
+        )
+    else:
+        padded_matrices = [
+            pad_to_max_length(t, max_length, dims_to_pad, value) for t in tensors
+        ]
+        stacked = torch.stack(padded_matrices, dim=dim)
+    if pin_memory and torch.cuda.is_available():
+        stacked = stacked.pin_memory()
+    return stacked
+
+
+def _nested_to_padded(
+    tensors: list[Tensor],
+    value: int | float,
+    output_size: Sequence[int] | None = None,
+) -> Tensor:
+    """Pack tensors into a nested tensor and pad it into one tensor
+    of `output_size` (by default the envelope of all tensors)."""
+    with warnings.catch_warnings():
+        # torch warns that the nested tensor API is a prototype
+        warnings.simplefilter("ignore", UserWarning)
+        nested = torch.nested.as_nested_tensor(tensors)
+    if output_size is None:
+        return nested.to_padded_tensor(value)
+    return nested.to_padded_tensor(value, output_size=[int(n) for n in output_size])
+
+
+def nested_pad_and_stack(
+    tensors: list[Tensor],
+    value: int | float = PAD_VALUE,
+    multiple_of: int = 1,
+) -> Tensor:
+    """Right pads a list of tensors to the maximum length observed along each dimension and stacks them along a new leading dimension.
+
+    Equivalent to `pad_and_stack(tensors, dim=0, value=value)`, but packs the tensors
+    into a single nested tensor and pads it in one pass instead of padding each
+    tensor separately before stacking.
+
+    Parameters:
+        tensors (list[Tensor]): A list of tensors with the same number of dimensions and dtype
+        value (int | float): The value to pad with, by default PAD_VALUE
+        multiple_of (int): Round the padded length of the first dimension of the tensors
+            (e.g. residues or atoms) up to a multiple of this value, by default 1.
+            Lengths that are multiples of 8 let downstream matmuls use Tensor Cores.
+
+    Returns:
+        Tensor: The padded and stacked tensor
+            Example: input: [(4, 4, 3), (7, 7, 3)]
+                output: (2, 7, 7, 3)
+
+    """
+    assert (
+        len({t.ndim for t in tensors}) == 1
+    ), "All `tensors` must have the same number of dimensions."
+    if multiple_of > 1:
+        envelope = [max(sizes) for sizes in zip(*(t.shape for t in tensors))]
+        envelope[0] = (envelope[0] + multiple_of - 1) // multiple_of * multiple_of
+        return _nested_to_padded(tensors, value, (len(tensors), *envelope))
+    return _nested_to_padded(tensors, value)
 
-    padded_matrices = [
-        pad_to_max_length(t, max_length, dims_to_pad, value) for t in tensors
-    ]
-    return torch.stack(padded_matrices, dim=dim)
+
+def _maybe_fast_stack(
+    arrays: Iterable[ArrayLike],
+    value: int | float = PAD_VALUE,
+    multiple_of: int = 1,
+) -> Tensor:
+    """Same as `nested_pad_and_stack` on the tensors of `arrays`, but stacks
+    them directly with numpy when they already have the padded shape."""
+    chains: list[NDArray[Any]] = [np.asarray(a) for a in arrays]
+    shapes = {chain.shape for chain in chains}
+    if len(shapes) == 1 and chains[0].shape[0] % multiple_of == 0:
+        return torch.from_numpy(np.stack(chains))
+    return nested_pad_and_stack(
+        [_as_tensor(chain) for chain in chains], value=value, multiple_of=multiple_of
+    )
 
 
 def collate_complex(
-    batch_features: list[dict[str, Tensor]],
+    batch_features: Sequence[Mapping[str, Tensor | Sequence[ArrayLike]]],
     pad_value: int = PAD_VALUE,
+    multiple_of: int = 1,
+    pin_memory: bool = False,
 ) -> dict[str, Tensor]:
-    collated_and_padded_properties = {}
-    batch_size = len(batch_features)
-
-    feature_names = batch_features[0].keys()
-    for feat_name in feature_names:
-        collated_properties = []
-        for idx in range(batch_size):
-            feat = batch_features[idx][feat_name]
-            collated_properties.append(feat)
-        collated_and_padded_properties[feat_name] = pad_and_stack(
-            collated_properties, dim=0, value=pad_value
+    """Merge the features of a batch of samples into one padded tensor per feature.
+
+    Parameters:
+        batch_features (Sequence[Mapping[str, Tensor | Sequence[ArrayLike]]]): The features of every sample,
+            either already padded and stacked per sample (`[C, N, ...]` tensors) or
+            unpadded as one array per chain (`structure_featurizer` with `pad=False`)
+        pad_value (int): The value to pad with, by default PAD_VALUE
+        multiple_of (int): Round the padded length of the per-chain arrays up to a multiple
+            of this value, by default 1. Only applies to per-chain arrays.
+        pin_memory (bool): Allocate the batch of per-chain arrays in page-locked memory
+            (when CUDA is available), by default False. Only applies to per-chain arrays.
+
+    Returns:
+        dict[str, Tensor]: The `[B, C, N, ...]` padded tensor of every feature
+
+    """
+    first = batch_features[0]
+    tensor_feats: dict[str, list[Tensor]] = {
+        feat_name: [] for feat_name, feat in first.items() if isinstance(feat, Tensor)
+    }
+    chain_feats: dict[str, list[Sequence[ArrayLike]]] = {
+        feat_name: []
+        for feat_name, feat in first.items()
+        if not isinstance(feat, Tensor)
+    }
+    # gather every feature in a single pass over the batch
+    for features in batch_features:
+        for feat_name, tensors in tensor_feats.items():
+            tensor = features[feat_name]
+            assert isinstance(tensor, Tensor)
+            tensors.append(tensor)
+        for feat_name, samples in chain_feats.items():
+            chains = features[feat_name]
+            assert not isinstance(chains, Tensor)
+            samples.append(chains)
+    collated: dict[str, Tensor] = {}
+    for feat_name, samples in chain_feats.items():
+        # per-chain arrays are copied straight into the batch
+        collated[feat_name] = _pad_chains_into(
+            samples, pad_value, multiple_of, pin_memory
         )
-    return collated_and_padded_properties
+    for feat_name, tensors in tensor_feats.items():
+        if tensors[0].is_cuda:
+            # on GPU a single nested to_padded kernel beats one copy per sample
+            collated[feat_name] = nested_pad_and_stack(tensors, value=pad_value)
+        else:
+            # on CPU copying into a preallocated tensor is faster
+            collated[feat_name] = _pad_into(tensors, pad_value)
+    return {feat_name: collated[feat_name] for feat_name in first}
+
+
+def _pad_into(tensors: Sequence[Tensor], value: int | float) -> Tensor:
+    """Stack tensors along a new leading dimension, right padding every
+    dimension to the batch maximum, by copying into one preallocated tensor."""
+    assert (
+        len({t.ndim for t in tensors}) == 1
+    ), "All `tensors` must have the same number of dimensions."
+    envelope = [max(sizes) for sizes in zip(*(t.shape for t in tensors))]
+    out = torch.full(
+        (len(tensors), *envelope),
+        value,
+        dtype=tensors[0].dtype,
+        device=tensors[0].device,
+    )
+    for i, t in enumerate(tensors):
+        out[i][tuple(slice(0, n) for n in t.shape)].copy_(t)
+    return out
+
+
+def _pad_chains_into(
+    samples: Sequence[Sequence[ArrayLike]],
+    value: int | float,
+    multiple_of: int = 1,
+    pin_memory: bool = False,
+) -> Tensor:
+    """Copy the per-chain arrays of every sample into one preallocated
+    `[B, C, N, ...]` tensor, right padding chains and every chain dimension."""
+    arrays = [[np.asarray(chain) for chain in sample] for sample in samples]
+    chains = [chain for sample in arrays for chain in sample]
+    assert (
+        len({chain.ndim for chain in chains}) == 1
+    ), "All per-chain arrays must have the same number of dimensions."
+    envelope = [max(sizes) for sizes in zip(*(chain.shape for chain in chains))]
+    if multiple_of > 1:
+        envelope[0] = (envelope[0] + multiple_of - 1) // multiple_of * multiple_of
+    out = torch.full(
+        (len(arrays), max(len(sample) for sample in arrays), *envelope),
+        value,
+        dtype=_as_tensor(chains[0][:0]).dtype,
+        pin_memory=pin_memory and torch.cuda.is_available(),
+    )
+    for i, sample in enumerate(arrays):
+        for j, chain in enumerate(sample):
+            out[i, j][tuple(slice(0, n) for n in chain.shape)].copy_(_as_tensor(chain))
+    return out
 
 
 def collate_batch(
@@ -205,6 +388,10 @@ def collate_batch(
         "holo_structures": holo_structures,
         "alternate_structures": alternate_structures,
         "paths": paths,
-        "features_and_coords": collate_complex(feature_and_coords),  # type: ignore
+        # per-chain features are padded to a multiple of 8 residues / atoms,
+        # the same shapes as features padded by structure_featurizer
+        "features_and_coords": collate_complex(  # type: ignore
+            feature_and_coords, multiple_of=8
+        ),
     }
     return collated_batch
@@ -12,7 +12,7 @@ from .clusters import query_clusters
 from .index import query_index
 from .ligand import cross_similarity as cross_ligand_similarity
 from .ligand import query_ligand_similarity
-from .links import query_links
+from .links import query_linked_system_ids, query_links, query_links_bulk
 from .protein import (
     cross_similarity as cross_protein_similarity,
 )
@@ -27,5 +27,7 @@ __all__ = [
     "cross_protein_similarity",
     "query_clusters",
     "query_links",
+    "query_links_bulk",
+    "query_linked_system_ids",
     "query_index",
 ]
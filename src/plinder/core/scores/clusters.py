@@ -3,9 +3,8 @@
 from __future__ import annotations
 
 import pandas as pd
-from duckdb import sql
 
-from plinder.core.scores.query import FILTERS, make_query
+from plinder.core.scores.query import FILTERS, make_query, sql
 from plinder.core.utils import cpl
 from plinder.core.utils.config import get_config
 from plinder.core.utils.dec import timeit
@@ -5,9 +5,9 @@ from __future__ import annotations
 from pathlib import Path
 
 import pandas as pd
-from duckdb import sql
+from duckdb import DuckDBPyRelation
 
-from plinder.core.scores.query import FILTERS, make_query
+from plinder.core.scores.query import FILTERS, make_query, sql
 from plinder.core.utils import cpl
 from plinder.core.utils.config import get_config
 from plinder.core.utils.dec import timeit
@@ -16,26 +16,16 @@ from plinder.core.utils.log import setup_logger
 LOG = setup_logger(__name__)
 
 
-@timeit
-def query_links(
-    *,
-    columns: list[str] | None = None,
-    filters: FILTERS = None,
-) -> pd.DataFrame:
+def _links_dataset() -> tuple[Path, bool]:
     """
-    Query the linked systems dataset
-
-    Parameters
-    ----------
-    columns : list[str], default=None
-        the columns to return
-    filters : list[tuple[str, str, str]]
-        the filters to apply
+    Locate the linked systems dataset, removing stale files
 
     Returns
     -------
-    df : pd.DataFrame
-        the linked systems results
+    dataset : Path
+        the linked systems dataset
+    new : bool
+        whether the dataset is partitioned by kind
     """
     cfg = get_config()
     dataset = cpl.get_plinder_path(rel=cfg.data.links)
@@ -46,6 +36,15 @@ def query_links(
     if (dataset / "pred_links.parquet").is_file():
         LOG.warn("found old pred links, removing")
         (dataset / "pred_links.parquet").unlink()
+    return dataset, new
+
+
+def _links_relation(
+    dataset: Path,
+    new: bool,
+    columns: list[str] | None,
+    filters: FILTERS,
+) -> DuckDBPyRelation:
     if not new and columns and "filename" not in columns:
         # bugfix: necessary for determining the "kind" below
         columns.append("filename")
@@ -60,8 +59,121 @@ def query_links(
         include_filename=not new,
     )
     assert query is not None
-    df = sql(query).to_df()
+    return sql(query)
+
+
+def _with_kind(df: pd.DataFrame, new: bool) -> pd.DataFrame:
     if not new:
-        df["kind"] = df["filename"].apply(lambda x: Path(x).stem.split("_links")[0])
+        # only a handful of distinct files back the dataset, so parse
+        # each filename once and map the result rather than per row
+        kinds = {
+            filename: Path(filename).stem.split("_links")[0]
+            for filename in df["filename"].unique()
+        }
+        df["kind"] = df["filename"].map(kinds)
         df.drop(columns=["filename"], inplace=True)
     return df
+
+
+@timeit
+def query_links(
+    *,
+    columns: list[str] | None = None,
+    filters: FILTERS = None,
+) -> pd.DataFrame:
+    """
+    Query the linked systems dataset
+
+    Parameters
+    ----------
+    columns : list[str], default=None
+        the columns to return
+    filters : list[tuple[str, str, str]]
+        the filters to apply
+
+    Returns
+    -------
+    df : pd.DataFrame
+        the linked systems results
+    """
+    dataset, new = _links_dataset()
+    df = _links_relation(dataset, new, columns, filters).to_df()
+    return _with_kind(df, new)
+
+
+_LINKED_SYSTEMS: dict[str, tuple[frozenset[str], pd.DataFrame]] = {}
+
+
+def _linked_systems() -> tuple[frozenset[str], pd.DataFrame]:
+    dataset, new = _links_dataset()
+    key = dataset.as_posix()
+    if key not in _LINKED_SYSTEMS:
+        relation = _links_relation(dataset, new, None, None)
+        system_ids = relation.project("reference_system_id").distinct().fetchall()
+        empty = _with_kind(relation.limit(0).to_df(), new)
+        _LINKED_SYSTEMS[key] = (frozenset(row[0] for row in system_ids), empty)
+    return _LINKED_SYSTEMS[key]
+
+
+def query_linked_system_ids() -> frozenset[str]:
+    """
+    The reference system IDs that have at least one linked system.
+    Computed once per process with a single distinct query.
+
+    Returns
+    -------
+    system_ids : frozenset[str]
+        the reference system IDs with links
+    """
+    return _linked_systems()[0]
+
+
+def empty_links() -> pd.DataFrame:
+    """
+    An empty linked systems result with the same columns and dtypes
+    as query_links, for systems known to have no links
+
+    Returns
+    -------
+    df : pd.DataFrame
+        the empty linked systems result
+    """
+    return _linked_systems()[1].copy()
+
+
+def query_links_bulk(
+    *,
+    system_ids: list[str],
+    columns: list[str] | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Query the linked systems dataset for many reference systems
+    at once, issuing a single query instead of one per system.
+
+    Parameters
+    ----------
+    system_ids : list[str]
+        the reference system IDs to fetch links for
+    columns : list[str], default=None
+        the columns to return
+
+    Returns
+    -------
+    links : dict[str, pd.DataFrame]
+        the linked systems results keyed by reference system ID.
+        Systems without any links map to an empty dataframe.
+    """
+    if not len(system_ids):
+        return {}
+    if columns is not None and "reference_system_id" not in columns:
+        columns = columns + ["reference_system_id"]
+    df = query_links(
+        columns=columns,
+        filters=[("reference_system_id", "in", set(system_ids))],
+    )
+    links = {
+        system_id: group.reset_index(drop=True)
+        for system_id, group in df.groupby("reference_system_id", sort=False)
+    }
+    empty = df.iloc[:0]
+    return {system_id: links.get(system_id, empty) for system_id in system_ids}
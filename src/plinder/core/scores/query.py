@@ -2,9 +2,12 @@
 # Distributed under the terms of the Apache License 2.0
 from __future__ import annotations
 
+import os
+import threading
 from pathlib import Path
 from typing import List, NewType, Set, Tuple, Union
 
+import duckdb
 import numpy as np
 import pyarrow as pa
 
@@ -14,6 +17,43 @@ LOG = setup_logger(__name__)
 SQL_OP_MAP = {"==": "="}
 FILTER = NewType("FILTER", Tuple[str, str, Union[str, Set[str]]])
 FILTERS = Union[List[List[FILTER]], List[FILTER], None]
+_LOCAL = threading.local()
+
+
+def _get_connection() -> duckdb.DuckDBPyConnection:
+    """
+    Lazily create a duckdb connection local to the current
+    process and thread. duckdb connections do not survive a
+    fork, so DataLoader workers each open their own.
+
+    Returns
+    -------
+    con : duckdb.DuckDBPyConnection
+        the connection for this process and thread
+    """
+    pid = os.getpid()
+    if getattr(_LOCAL, "pid", None) != pid:
+        _LOCAL.con = duckdb.connect()
+        _LOCAL.pid = pid
+    con: duckdb.DuckDBPyConnection = _LOCAL.con
+    return con
+
+
+def sql(query: str) -> duckdb.DuckDBPyRelation:
+    """
+    Run a query on the process and thread local duckdb connection
+
+    Parameters
+    ----------
+    query : str
+        the duckdb SQL query string
+
+    Returns
+    -------
+    relation : duckdb.DuckDBPyRelation
+        the query result
+    """
+    return _get_connection().sql(query)
 
 
 def _handle_condition_by_schema(
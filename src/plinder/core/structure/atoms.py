@@ -4,6 +4,8 @@ from __future__ import annotations
 
 import copy
 import gzip
+import io
+import os
 from pathlib import Path
 from typing import Any, Union
 
@@ -76,6 +78,23 @@ def biotite_ciffile() -> TextFile:
     return CIFFile
 
 
+_CIF_READ_BUFFER = 8 * 1024 * 1024
+
+
+def _read_cif_text(path: Path) -> str:
+    """
+    Read a plain-text CIF file in a single large buffered read,
+    hinting the kernel to prefetch it sequentially where supported
+    """
+    with open(path, "rb", buffering=_CIF_READ_BUFFER) as f:
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        return f.read().decode("utf-8")
+
+
 def atom_array_from_cif_file(
     structure: Path | _AtomArrayOrStack, use_author_fields: bool = True
 ) -> AtomArray | None:
@@ -91,7 +110,7 @@ def atom_array_from_cif_file(
                 with gzip.open(str(structure), "rt", encoding="utf-8") as f:
                     mod = reader.read(f)
             else:
-                mod = reader.read(structure)
+                mod = reader.read(io.StringIO(_read_cif_text(structure)))
             arr = get_structure(
                 mod, model=1, use_author_fields=use_author_fields, include_bonds=True
             )  # noqa
@@ -261,11 +280,11 @@ def get_residue_index_mapping_mask(
     ref_seqs: dict[str, str], subject_arr: _AtomArrayOrStack
 ) -> dict[str, list[int]]:
     mask_map = {}
+    chain_index_map = _chain_index_map(subject_arr, list(ref_seqs))
     for reference_chain, ref_seq in ref_seqs.items():
         # refernece and subject chain are the same
         subject_chain = reference_chain
-        subject_mask = subject_arr.chain_id == subject_chain
-        subject_ch_arr = apply_mask(subject_arr, subject_mask)
+        subject_ch_arr = apply_mask(subject_arr, chain_index_map[subject_chain])
 
         subj_info = _get_structure_and_res_info(subject_ch_arr)
         subj_seq, subj_numbering = _convert_resn_to_sequence_and_numbering(subj_info)
@@ -278,10 +297,10 @@ def get_residue_index_mapping_mask(
             ref_numbering_mapped,
             _,
         ) = alignments
+        # mark the 1-based reference positions that aligned to the subject
         mask = np.zeros(len(ref_seq))
-        for i in range(len(mask)):
-            if (i + 1) in ref_numbering_mapped:
-                mask[i] = 1
+        mapped = np.asarray(ref_numbering_mapped, dtype=np.int64) - 1
+        mask[mapped[(mapped >= 0) & (mapped < len(mask))]] = 1
         mask_map[reference_chain] = mask
     return mask_map
 
@@ -344,16 +363,36 @@ def make_atom_mask(
     return [atm for res in atom_mask for atm in res]
 
 
+def _chain_index_map(
+    atom_arr: _AtomArrayOrStack,
+    chain_order_list: list[str],
+) -> dict[str, NDArray[np.int_]]:
+    """
+    Atom indices of every chain in chain_order_list, from a single pass over
+    the chain ids. Chains without atoms map to an empty index array.
+    """
+    chains, inverse = np.unique(atom_arr.chain_id, return_inverse=True)
+    position = {chain: i for i, chain in enumerate(dict.fromkeys(chain_order_list))}
+    # atoms of chains missing from chain_order_list sort to the end
+    chain_codes = np.array([position.get(chain, len(position)) for chain in chains])
+    codes = chain_codes[inverse]
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=len(position) + 1)
+    per_chain = np.split(order, np.cumsum(counts)[:-1])
+    return {chain: per_chain[i] for chain, i in position.items()}
+
+
 def _stack_atom_array_features(
     atom_arr: _AtomArrayOrStack,
     atom_arr_feat: str,
     chain_order_list: list[str] | None,
+    chain_index_map: dict[str, NDArray[np.int_]] | None = None,
 ) -> list[NDArray[np.int_ | np.str_ | np.float_]]:
     assert chain_order_list is not None
-    return [
-        getattr(atom_arr[atom_arr.chain_id == chain], atom_arr_feat)
-        for chain in chain_order_list
-    ]
+    if chain_index_map is None:
+        chain_index_map = _chain_index_map(atom_arr, chain_order_list)
+    feat = getattr(atom_arr, atom_arr_feat)
+    return [feat[chain_index_map[chain]] for chain in chain_order_list]
 
 
 def _stack_ligand_feat(
@@ -363,25 +402,87 @@ def _stack_ligand_feat(
     return [feat_dict[chain] for chain in chain_order_list]
 
 
+_ONE_HOT_TABLES: dict[
+    tuple[tuple[str, int], ...],
+    tuple[NDArray[np.str_], NDArray[np.int_], NDArray[np.float64]],
+] = {}
+
+
+def _one_hot_lookup(
+    feature_dict: dict[str, int],
+) -> tuple[NDArray[np.str_], NDArray[np.int_], NDArray[np.float64]]:
+    """Sorted keys, their indices and the one-hot rows for feature_dict."""
+    # keyed on the vocabulary itself, so that a dict changed after its
+    # first lookup never gets a stale table
+    items = tuple(sorted(feature_dict.items()))
+    tables = _ONE_HOT_TABLES.get(items)
+    if tables is None:
+        tables = (
+            np.array([k for k, _ in items]),
+            np.array([v for _, v in items]),
+            np.eye(len(set(feature_dict.values()))),
+        )
+        _ONE_HOT_TABLES[items] = tables
+    return tables
+
+
+# build the tables of the featurizer vocabularies at import time, so that
+# forked data loader workers inherit them instead of each rebuilding them
+for _feature_dict in (pc.ELE2NUM, pc.AA_TO_INDEX):
+    _one_hot_lookup(_feature_dict)
+
+
 def _one_hot_encode_stack(
     stack: list[NDArray],
     feature_dict: dict[str, int],
     unknown_name_filler: str,
 ) -> list[NDArray]:
-    feat_array = []
+    keys, indices, table = _one_hot_lookup(feature_dict)
     unknown_name_filler_value = feature_dict[unknown_name_filler]
+    feat_array = []
     for per_chain_feat in stack:
-        feat_array_by_chain = np.zeros(
-            (len(per_chain_feat), len(set(list(feature_dict.values()))))
-        )
-        for index, value in enumerate(per_chain_feat):
-            feat_array_by_chain[
-                index, feature_dict.get(value, unknown_name_filler_value)
-            ] = 1.0
-        feat_array.append(feat_array_by_chain)
+        values = np.asarray(per_chain_feat, dtype=str)
+        pos = np.minimum(np.searchsorted(keys, values), len(keys) - 1)
+        found = keys[pos] == values
+        index = np.where(found, indices[pos], unknown_name_filler_value)
+        feat_array.append(table[index])
     return feat_array
 
 
+_FULL_ATOM_RESIDUES = [
+    one for one, three in pc.ONE_TO_THREE.items() if three in pc.ORDERED_AA_FULL_ATOM
+]
+# flattened atom names of every residue, with per residue offsets and counts,
+# so that a sequence expands to its atoms with a single gather
+_FULL_ATOM_NAMES = np.array(
+    [
+        atom
+        for one in _FULL_ATOM_RESIDUES
+        for atom in pc.ORDERED_AA_FULL_ATOM[pc.ONE_TO_THREE[one]]
+    ]
+)
+_FULL_ATOM_COUNTS = np.array(
+    [len(pc.ORDERED_AA_FULL_ATOM[pc.ONE_TO_THREE[one]]) for one in _FULL_ATOM_RESIDUES]
+)
+_FULL_ATOM_OFFSETS = np.cumsum(_FULL_ATOM_COUNTS) - _FULL_ATOM_COUNTS
+_FULL_ATOM_RESIDUE_INDEX = np.full(256, -1)
+_FULL_ATOM_RESIDUE_INDEX[[ord(one) for one in _FULL_ATOM_RESIDUES]] = np.arange(
+    len(_FULL_ATOM_RESIDUES)
+)
+
+
+def _sequence_full_atom_names(sequence: str) -> NDArray[np.str_]:
+    """Atom names of every residue of sequence, in ORDERED_AA_FULL_ATOM order."""
+    codes = _FULL_ATOM_RESIDUE_INDEX[np.frombuffer(sequence.encode(), dtype=np.uint8)]
+    if (codes < 0).any():
+        unknown = sorted({res for res in sequence if res not in _FULL_ATOM_RESIDUES})
+        raise KeyError(f"no full atom definition for residues {unknown}")
+    counts = _FULL_ATOM_COUNTS[codes]
+    starts = np.repeat(_FULL_ATOM_OFFSETS[codes] - (np.cumsum(counts) - counts), counts)
+    names: NDArray[np.str_] = _FULL_ATOM_NAMES[starts + np.arange(counts.sum())]
+    return names
+
+
 def _sequence_full_atom_type_array(
     input_sequences: dict[str, str]
 ) -> dict[str, NDArray]:
@@ -7,6 +7,7 @@ import copy
 
 import networkx as nx
 import numpy as np
+from numpy.typing import NDArray
 from rdkit import Chem, RDLogger
 from rdkit.Chem import AllChem, GetPeriodicTable, rdMolTransforms
 from rdkit.Chem.rdchem import BondType as BT
@@ -375,10 +376,28 @@ def safe_index(l, e):
         return len(l) - 1
 
 
-def lig_atom_featurizer(mol: Chem.rdchem.Mol) -> list[list[int]]:
-    ringinfo = mol.GetRingInfo()
-    atom_features_list = []
-    for idx, atom in enumerate(mol.GetAtoms()):
+def _range_index(values, allowed):
+    """Vectorized safe_index for allowed lists of consecutive integers followed by "misc" """
+    lo, n = allowed[0], len(allowed) - 1
+    idx = np.asarray(values, dtype=np.int64) - lo
+    idx[(idx < 0) | (idx >= n)] = n
+    return idx
+
+
+_hybridization_index = {
+    h: i
+    for i, h in enumerate(allowable_features["possible_hybridization_list"])
+    if h != "misc"
+}
+
+
+def lig_atom_featurizer(mol: Chem.rdchem.Mol) -> NDArray[np.int64]:
+    # gather the raw atom properties in a single pass over the atoms and
+    # then map them to feature indices with vectorized numpy operations
+    atoms = list(mol.GetAtoms())
+    n_atoms = len(atoms)
+    chiral_tags = []
+    for atom in atoms:
         chiral_tag = str(atom.GetChiralTag())
         if chiral_tag in [
             "CHI_SQUAREPLANAR",
@@ -386,64 +405,59 @@ def lig_atom_featurizer(mol: Chem.rdchem.Mol) -> list[list[int]]:
             "CHI_OCTAHEDRAL",
         ]:
             chiral_tag = "CHI_OTHER"
-
-        atom_features_list.append(
-            [
-                safe_index(
-                    allowable_features["possible_atomic_num_list"], atom.GetAtomicNum()
-                ),
-                allowable_features["possible_chirality_list"].index(str(chiral_tag)),
-                safe_index(
-                    allowable_features["possible_degree_list"], atom.GetTotalDegree()
-                ),
-                safe_index(
-                    allowable_features["possible_formal_charge_list"],
-                    atom.GetFormalCharge(),
-                ),
-                safe_index(
-                    allowable_features["possible_implicit_valence_list"],
-                    atom.GetImplicitValence(),
-                ),
-                safe_index(
-                    allowable_features["possible_numH_list"], atom.GetTotalNumHs()
-                ),
-                safe_index(
-                    allowable_features["possible_number_radical_e_list"],
-                    atom.GetNumRadicalElectrons(),
-                ),
-                safe_index(
-                    allowable_features["possible_hybridization_list"],
-                    str(atom.GetHybridization()),
-                ),
-                allowable_features["possible_is_aromatic_list"].index(
-                    atom.GetIsAromatic()
-                ),
-                safe_index(
-                    allowable_features["possible_numring_list"],
-                    ringinfo.NumAtomRings(idx),
-                ),
-                allowable_features["possible_is_in_ring3_list"].index(
-                    ringinfo.IsAtomInRingOfSize(idx, 3)
-                ),
-                allowable_features["possible_is_in_ring4_list"].index(
-                    ringinfo.IsAtomInRingOfSize(idx, 4)
-                ),
-                allowable_features["possible_is_in_ring5_list"].index(
-                    ringinfo.IsAtomInRingOfSize(idx, 5)
-                ),
-                allowable_features["possible_is_in_ring6_list"].index(
-                    ringinfo.IsAtomInRingOfSize(idx, 6)
-                ),
-                allowable_features["possible_is_in_ring7_list"].index(
-                    ringinfo.IsAtomInRingOfSize(idx, 7)
-                ),
-                allowable_features["possible_is_in_ring8_list"].index(
-                    ringinfo.IsAtomInRingOfSize(idx, 8)
-                ),
-                # g_charge if not np.isnan(g_charge) and not np.isinf(g_charge) else 0.
-            ]
+        chiral_tags.append(
+            allowable_features["possible_chirality_list"].index(chiral_tag)
         )
-    return atom_features_list
+    misc_hybridization = len(allowable_features["possible_hybridization_list"]) - 1
+    hybridizations = [
+        _hybridization_index.get(str(atom.GetHybridization()), misc_hybridization)
+        for atom in atoms
+    ]
+
+    # ring membership from the ring info in one pass over the rings instead
+    # of querying every atom for every ring size
+    num_rings = np.zeros(n_atoms, dtype=np.int64)
+    in_ring_of_size = np.zeros((n_atoms, 9), dtype=np.int64)
+    for ring in mol.GetRingInfo().AtomRings():
+        ring_atoms = list(ring)
+        num_rings[ring_atoms] += 1
+        if len(ring) < 9:
+            in_ring_of_size[ring_atoms, len(ring)] = 1
+
+    features = np.empty((n_atoms, 16), dtype=np.int64)
+    features[:, 0] = _range_index(
+        [atom.GetAtomicNum() for atom in atoms],
+        allowable_features["possible_atomic_num_list"],
+    )
+    features[:, 1] = chiral_tags
+    features[:, 2] = _range_index(
+        [atom.GetTotalDegree() for atom in atoms],
+        allowable_features["possible_degree_list"],
+    )
+    features[:, 3] = _range_index(
+        [atom.GetFormalCharge() for atom in atoms],
+        allowable_features["possible_formal_charge_list"],
+    )
+    features[:, 4] = _range_index(
+        [atom.GetImplicitValence() for atom in atoms],
+        allowable_features["possible_implicit_valence_list"],
+    )
+    features[:, 5] = _range_index(
+        [atom.GetTotalNumHs() for atom in atoms],
+        allowable_features["possible_numH_list"],
+    )
+    features[:, 6] = _range_index(
+        [atom.GetNumRadicalElectrons() for atom in atoms],
+        allowable_features["possible_number_radical_e_list"],
+    )
+    features[:, 7] = hybridizations
+    features[:, 8] = [int(atom.GetIsAromatic()) for atom in atoms]
+    features[:, 9] = _range_index(
+        num_rings, allowable_features["possible_numring_list"]
+    )
+    features[:, 10:16] = in_ring_of_size[:, 3:9]
+    # g_charge if not np.isnan(g_charge) and not np.isinf(g_charge) else 0.
+    return features
 
 
 def get_lig_graph(mol):
@@ -9,7 +9,16 @@ class Base(BaseModel):
     )
 
 
-class ChainConfig(Base):
+class MutableBase(Base):
+    """Base for intermediate models that are mutated in place.
+
+    Fields are validated on construction but not on every assignment.
+    """
+
+    model_config = ConfigDict(validate_assignment=False)
+
+
+class ChainConfig(MutableBase):
     """Preparation configuration settings.
 
     Default configuration for preparation of normalized monomers,
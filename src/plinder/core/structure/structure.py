@@ -14,6 +14,8 @@ from rdkit import Chem
 
 from plinder.core.structure import surgery
 from plinder.core.structure.atoms import (
+    _chain_index_map,
+    _sequence_full_atom_names,
     _stack_atom_array_features,
     atom_array_from_cif_file,
     generate_input_conformer,
@@ -201,9 +203,11 @@ class Structure(BaseModel):
         if self.protein_atom_array is None:
             raise ValueError("Protein atom array not loaded")
         self.protein_sequence = {}
-        for chain in self.protein_chain_ordered:
+        chain_order = self.protein_chain_ordered
+        chain_index_map = _chain_index_map(self.protein_atom_array, chain_order)
+        for chain in chain_order:
             self.protein_sequence[chain] = struc.to_sequence(
-                self.protein_atom_array[self.protein_atom_array.chain_id == chain]
+                self.protein_atom_array[chain_index_map[chain]]
             )
         if not len(self.protein_sequence):
             raise ValueError("Protein sequence could not be loaded")
@@ -451,19 +455,47 @@ class Structure(BaseModel):
             refined_rmsd,
         )
 
-    @property
-    def input_sequence_residue_mask_stacked(self) -> list[list[int]]:
-        """Input sequence stacked by chain"""
+    def _residue_index_masks(self) -> dict[str, list[int]]:
         # TODO: do we want to keep this as assertion?
         # better if then raise?
         assert self.protein_atom_array is not None
         assert self.protein_sequence is not None
 
-        seqres_masks = get_residue_index_mapping_mask(
+        return get_residue_index_mapping_mask(
             self.protein_sequence, self.protein_atom_array
         )
+
+    def _atom_masks(self, seqres_masks: dict[str, list[int]]) -> list[list[int]]:
+        assert self.protein_atom_array is not None
+        assert self.protein_sequence is not None
+
+        chain_order = self.protein_chain_ordered
+        chain_index_map = _chain_index_map(self.protein_atom_array, chain_order)
+        return [
+            make_atom_mask(
+                self.protein_atom_array[chain_index_map[ch]],
+                self.protein_sequence[ch],
+                seqres_masks[ch],
+            )
+            for ch in chain_order
+        ]
+
+    @property
+    def input_sequence_residue_mask_stacked(self) -> list[list[int]]:
+        """Input sequence stacked by chain"""
+        seqres_masks = self._residue_index_masks()
         return [seqres_masks[ch] for ch in self.protein_chain_ordered]
 
+    @property
+    def sequence_masks_stacked(self) -> tuple[list[list[int]], list[list[int]]]:
+        """
+        Both input_sequence_residue_mask_stacked and sequence_atom_mask,
+        sharing a single sequence to structure alignment per chain
+        """
+        seqres_masks = self._residue_index_masks()
+        residue_masks = [seqres_masks[ch] for ch in self.protein_chain_ordered]
+        return residue_masks, self._atom_masks(seqres_masks)
+
     @property
     def input_sequence_list_ordered_by_chain(self) -> list[str] | None:
         """List of protein chains ordered the way it is in structure."""
@@ -476,14 +508,13 @@ class Structure(BaseModel):
     def protein_chain_ordered(self) -> list[str]:
         """List of protein chains ordered the way it is in structure"""
         assert self.protein_atom_array is not None
-        chain_order = []
-        for ch_id in self.protein_atom_array.chain_id:
-            if ch_id not in chain_order:
-                chain_order.append(ch_id)
+        chain_ids = self.protein_atom_array.chain_id
+        _, first_atoms = np.unique(chain_ids, return_index=True)
+        chain_order: list[str] = list(chain_ids[np.sort(first_atoms)])
         return chain_order
 
     @property
-    def input_sequence_full_atom_feat(self) -> dict[str, list[str]]:
+    def input_sequence_full_atom_feat(self) -> dict[str, NDArray[np.str_]]:
         """Resolved sequence full atom features."""
         # TODO: do we want to keep this as assertion?
         # better if then raise?
@@ -491,11 +522,7 @@ class Structure(BaseModel):
         assert self.protein_chain_ordered is not None
 
         seq_res_atom_dict = {
-            ch: [
-                atm
-                for res in self.protein_sequence[ch]
-                for atm in pc.ORDERED_AA_FULL_ATOM[pc.ONE_TO_THREE[res]]
-            ]
+            ch: _sequence_full_atom_names(self.protein_sequence[ch])
             for ch in self.protein_chain_ordered
         }
         return seq_res_atom_dict
@@ -503,22 +530,7 @@ class Structure(BaseModel):
     @property
     def sequence_atom_mask(self) -> list[list[int]]:
         """Sequence mask indicating which residues are resolved"""
-        # TODO: do we want to keep this as assertion?
-        # better if then raise?
-        assert self.protein_atom_array is not None
-        assert self.protein_sequence is not None
-
-        seqres_masks = get_residue_index_mapping_mask(
-            self.protein_sequence, self.protein_atom_array
-        )
-        return [
-            make_atom_mask(
-                self.protein_atom_array[self.protein_atom_array.chain_id == ch],
-                self.protein_sequence[ch],
-                seqres_masks[ch],
-            )
-            for ch in self.protein_chain_ordered
-        ]
+        return self._atom_masks(self._residue_index_masks())
 
     @property
     def ligand_chain_ordered(self) -> list[str]:
@@ -575,7 +587,7 @@ class Structure(BaseModel):
         protein_calpha_coords: list[NDArray] = [
             coord
             for coord in _stack_atom_array_features(
-                self.protein_atom_array[self.protein_atom_array.atom_name == "CA"],
+                self.protein_atom_array[self.protein_calpha_mask],
                 "coord",
                 self.protein_chain_ordered,
             )
@@ -672,10 +684,16 @@ class Structure(BaseModel):
         """torch.Tensor: The tokenized sequence representation of the structure sequence."""
         import torch
 
-        seq_encoding = torch.tensor(
-            [pc.AA_TO_INDEX[x] for x in self.protein_sequence_from_structure]
+        sequence = self.protein_sequence_from_structure
+        # residues without a token of their own (e.g. ASX -> B, GLX -> Z)
+        # are encoded as unknown instead of raising a KeyError
+        unknown = pc.AA_TO_INDEX["X"]
+        seq_encoding = np.fromiter(
+            (pc.AA_TO_INDEX.get(x, unknown) for x in sequence),
+            dtype=np.int64,
+            count=len(sequence),
         )
-        tokenized: torch.Tensor = seq_encoding.long()
+        tokenized: torch.Tensor = torch.from_numpy(seq_encoding)
         return tokenized
 
     @property
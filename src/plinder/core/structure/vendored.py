@@ -104,15 +104,17 @@ def mask_from_res_list(
     return mask
 
 
-def apply_mask(atoms: _AtomArrayOrStack, mask: NDArray[np.bool_]) -> _AtomArrayOrStack:
-    """Apply a boolean mask to an AtomArray or AtomArrayStack to filter atoms.
+def apply_mask(
+    atoms: _AtomArrayOrStack, mask: NDArray[np.bool_] | NDArray[np.int_]
+) -> _AtomArrayOrStack:
+    """Apply a boolean mask or index array to an AtomArray or AtomArrayStack to filter atoms.
 
     Parameters
     ----------
     atoms : (AtomArray | AtomArrayStack)
         The atoms to be filtered.
-    mask : NDArray[np.bool\_]
-        The boolean mask that specifies which atoms to keep.
+    mask : NDArray[np.bool\_] | NDArray[np.int\_]
+        The boolean mask, or the (ordered) indices, of the atoms to keep.
 
     Returns
     -------
@@ -2,6 +2,7 @@
 # Distributed under the terms of the Apache License 2.0
 from __future__ import annotations
 
+import threading
 from pathlib import Path
 from time import time
 from typing import Literal, Optional
@@ -52,15 +53,29 @@ def expand_config_context(
     return "two_char_codes", two_chars
 
 
+_DOWNLOAD_LOCKS: dict[str, threading.Lock] = {}
+_DOWNLOAD_LOCKS_GUARD = threading.Lock()
+
+
+def _download_lock(target: str) -> threading.Lock:
+    # one lock per downloaded file, so that threads resolving links
+    # concurrently fetch each file once instead of racing to write it
+    with _DOWNLOAD_LOCKS_GUARD:
+        return _DOWNLOAD_LOCKS.setdefault(target, threading.Lock())
+
+
 def _unpack_zip(path: Path) -> None:
     t0 = time()
     done = path.parent / (path.stem + "_done")
-    if done.is_file():
-        LOG.debug(f"skipping {path} as it was already extracted")
-        return
-    with ZipFile(path) as arch:
-        arch.extractall(path=path.parent)
-        done.touch()
+    # threads loading systems of the same zip (e.g. holo links) must not
+    # extract it on top of each other
+    with _download_lock(path.as_posix()):
+        if done.is_file():
+            LOG.debug(f"skipping {path} as it was already extracted")
+            return
+        with ZipFile(path) as arch:
+            arch.extractall(path=path.parent)
+            done.touch()
     LOG.debug(f"validating and extracting {path} took {time() - t0:.2f}s")
     return
 
@@ -55,9 +55,11 @@ def get_cluster_column_descriptions(
     plindex: pd.DataFrame
 ) -> list[tuple[str, str | None, str | None]]:
     rows: list[tuple[str, str | None, str | None]] = []
-    component_columns = [c for c in plindex.columns if c.endswith("__component")]
-    for column in component_columns:
-        metric, threshold, directed, cluster = column.split("__")
+    columns = plindex.columns
+    # split every cluster column in one pass instead of per column
+    components = columns[columns.str.endswith("__component")]
+    parts = components.str.split("__")
+    for column, (metric, threshold, directed, cluster) in zip(components, parts):
         rows.append(
             (
                 column,
@@ -65,9 +67,9 @@ def get_cluster_column_descriptions(
                 f"Cluster ID for {directed} {cluster} built from {metric} metric with {threshold} threshold",
             )
         )
-    community_columns = [c for c in plindex.columns if c.endswith("__community")]
-    for column in community_columns:
-        metric, threshold, cluster = column.split("__")
+    communities = columns[columns.str.endswith("__community")]
+    parts = communities.str.split("__")
+    for column, (metric, threshold, cluster) in zip(communities, parts):
         rows.append(
             (
                 column,
@@ -510,7 +510,11 @@ def make_sub_dbs(
     data_dir : Path
         the root plinder dir
     """
-    entries = utils.load_entries_from_zips(data_dir=data_dir)
+    entries = utils.load_entries_from_zips(
+        data_dir=data_dir,
+        skip_validation=True,
+        num_processes=os.cpu_count() or 1,
+    )
     db_dir = data_dir / "dbs" / "subdbs"
     db_dir.mkdir(exist_ok=True)
     LOG.info("making sub-databases for scoring")
@@ -553,7 +557,9 @@ def make_ligands(
     pdb_ids: list[str],
 ) -> None:
     """ """
-    entries = utils.load_entries_from_zips(data_dir=data_dir, pdb_ids=pdb_ids)
+    entries = utils.load_entries_from_zips(
+        data_dir=data_dir, pdb_ids=pdb_ids, skip_validation=True
+    )
     hashed_contents = utils.hash_contents(pdb_ids)
     output_dir = data_dir / "ligands"
     output_dir.mkdir(exist_ok=True, parents=True)
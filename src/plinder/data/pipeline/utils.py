@@ -4,27 +4,41 @@ from __future__ import annotations
 
 import multiprocessing
 import shutil
-from functools import wraps
+from functools import lru_cache, wraps
 from hashlib import md5
 from itertools import repeat
-from json import dumps, load
-from os import listdir
+from json import JSONEncoder, load, loads
+from os import listdir, scandir, stat
 from pathlib import Path
+from textwrap import dedent
 from time import time
-from typing import TYPE_CHECKING, Any, Callable, Dict, Literal, Optional, TypeVar
-from zipfile import ZIP_DEFLATED, ZipFile
-
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Literal,
+    Optional,
+    TypeVar,
+)
+from uuid import uuid4
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from omegaconf import DictConfig
 
-from plinder.core.scores import query_clusters
 from plinder.core.utils import schemas
 from plinder.core.utils.log import setup_logger
 from plinder.core.utils.unpack import expand_config_context
-from plinder.data.utils import tanimoto
-from plinder.data.utils.annotations.aggregate_annotations import Entry
 
 if TYPE_CHECKING:
+    from plinder.data.utils.annotations.aggregate_annotations import Entry
     from plinder.data.utils.annotations.get_similarity_scores import Scorer
 
 
@@ -113,12 +127,30 @@ def load_entries_from_zips(
     two_char_codes: Optional[list[str]] = None,
     pdb_ids: Optional[list[str]] = None,
     load_for_scoring: bool = False,
+    skip_validation: bool = False,
+    num_processes: int = 1,
 ) -> Dict[str, "Entry"]:
     """
     Load entries from the qc zips into a dict
-    """
-    from plinder.data.utils.annotations.aggregate_annotations import Entry
 
+    Parameters
+    ----------
+    data_dir : Path
+        the root plinder dir
+    two_char_codes : list[str], default=None
+        only load entries from these zips
+    pdb_ids : list[str], default=None
+        only load these entries
+    load_for_scoring : bool, default=False
+        prune the entries for scoring, see Entry.prune
+    skip_validation : bool, default=False
+        the zips are written by the pipeline itself, so the entries can
+        be constructed without full pydantic validation, which is much
+        faster (see DocBaseModel.model_construct_nested)
+    num_processes : int, default=1
+        decode the zips in this many spawned processes, only worth it
+        for many zips and not possible from within a pool worker
+    """
     per_zip: dict[str, list[str]] | None = None
     entry_msg = "all"
     if pdb_ids is not None:
@@ -135,29 +167,70 @@ def load_entries_from_zips(
         zip_paths = [data_dir / "entries" / f"{code}.zip" for code in two_char_codes]
     else:
         zip_paths = list((data_dir / "entries").glob("*"))
-    reduced = {}
     LOG.info(f"attempting to load {entry_msg} entries from {len(zip_paths)} zips")
-    for zip_path in zip_paths:
-        if not zip_path.is_file():
-            LOG.error(f"no archive {zip_path}, did you run structure_qc?")
-            continue
-        with ZipFile(zip_path) as archive:
-            names = archive.namelist()
-            if per_zip is not None:
-                names = per_zip[zip_path.stem]
-            for name in names:
-                try:
-                    with archive.open(name) as obj:
-                        pdb_id = name.replace(".json", "")
-                        reduced[pdb_id] = Entry.model_validate_json(obj.read()).prune(
-                            load_for_scoring=load_for_scoring,
-                        )
-                except Exception as e:
-                    LOG.error(f"failed to read name={name} failed with {repr(e)}")
+    args = [
+        (
+            zip_path,
+            None if per_zip is None else per_zip[zip_path.stem],
+            load_for_scoring,
+            skip_validation,
+        )
+        for zip_path in zip_paths
+    ]
+    reduced = {}
+    if num_processes > 1 and len(zip_paths) > 1:
+        # zips are independent so they can be decoded in parallel
+        processes = min(num_processes, len(zip_paths))
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            for entries in pool.starmap(_load_zip_entries, args):
+                reduced.update(entries)
+    else:
+        for arg in args:
+            reduced.update(_load_zip_entries(*arg))
     LOG.info(f"loaded {len(reduced)} entries from zips")
     return reduced
 
 
+def _load_zip_entries(
+    zip_path: Path,
+    names: list[str] | None,
+    load_for_scoring: bool,
+    skip_validation: bool,
+) -> Dict[str, "Entry"]:
+    """
+    Load the entries in names (or all entries) from a single qc zip
+    """
+    from plinder.data.utils.annotations.aggregate_annotations import Entry
+
+    reduced: Dict[str, "Entry"] = {}
+    if not zip_path.is_file():
+        LOG.error(f"no archive {zip_path}, did you run structure_qc?")
+        return reduced
+    with ZipFile(zip_path) as archive:
+        infolist = archive.infolist()
+        infos: list[ZipInfo | str] = list(infolist)
+        if names is not None:
+            members = {info.filename: info for info in infolist}
+            # unknown names are kept to report them below
+            infos = [members.get(name, name) for name in names]
+        for info in infos:
+            name = info if isinstance(info, str) else info.filename
+            try:
+                # reading by ZipInfo reuses the parsed directory record
+                raw = archive.read(info)
+                pdb_id = name.replace(".json", "")
+                if skip_validation:
+                    entry = Entry.model_construct_nested(loads(raw))
+                else:
+                    entry = Entry.model_validate_json(raw)
+                reduced[pdb_id] = entry.prune(
+                    load_for_scoring=load_for_scoring,
+                )
+            except Exception as e:
+                LOG.error(f"failed to read name={name} failed with {repr(e)}")
+    return reduced
+
+
 def get_db_sources(
     *, data_dir: Path, sub_databases: list[str] | None = None
 ) -> dict[str, Path]:
@@ -197,6 +270,7 @@ def get_scorer(
             pdb_ids=None,  # explicitly set to None to load all entries
             data_dir=data_dir,
             load_for_scoring=True,
+            skip_validation=True,
         )
         # TODO: bug where scatter_make_scorers uses raw ingest files
         #       instead of available entries from zips but Scorer
@@ -223,6 +297,8 @@ def save_ligand_batch(
     entries: dict[str, "Entry"],
     output_path: Path,
 ) -> None:
+    from plinder.data.utils import tanimoto
+
     dfs = []
     for entry in entries.values():
         df = tanimoto.load_ligands_from_entry(entry=entry)
@@ -233,8 +309,15 @@ def save_ligand_batch(
     for col in df.columns:
         nunique = df[col].nunique()
         LOG.info(f"save_ligand_batch: unique {col}={nunique}")
+    # fingerprint the batch here so compute_ligand_fingerprints
+    # does not have to fingerprint every ligand again
+    df[tanimoto.PACKED_ECFP4_COL] = tanimoto.get_packed_ecfp_fingerprints(
+        df["ligand_rdkit_canonical_smiles"],
+        radius=tanimoto.PACKED_ECFP4_RADIUS,
+        nbits=tanimoto.PACKED_ECFP4_NBITS,
+    )
     LOG.info(f"save_ligands_batch: writing {output_path}")
-    df.to_parquet(output_path, index=False)
+    df.to_parquet(output_path, index=False, compression="zstd")
 
 
 def hash_contents(contents: list[str]) -> str:
@@ -251,7 +334,13 @@ def hash_contents(contents: list[str]) -> str:
     hash : str
         unique string corresponding to contents
     """
-    return md5(dumps(sorted(contents)).encode("utf8")).hexdigest()
+    # stream the JSON encoding of the sorted list into md5, so the digest
+    # (used in file names of earlier runs) matches json.dumps without
+    # materializing the whole encoded string
+    digest = md5()
+    for chunk in JSONEncoder().iterencode(sorted(contents)):
+        digest.update(chunk.encode("utf8"))
+    return digest.hexdigest()
 
 
 def get_local_contents(
@@ -293,17 +382,53 @@ def get_local_contents(
         return (
             values if as_four_char_ids else [f"pdb_0000{pdb_id}" for pdb_id in values]
         )
-    codes = (
-        values
-        if kind == "two_char_codes" and len(values)
-        else listdir(data_dir.as_posix())
+    contents = _scan_local_contents(
+        data_dir.as_posix(),
+        _code_dir_stamps(
+            data_dir.as_posix(),
+            tuple(values) if kind == "two_char_codes" and len(values) else None,
+        ),
     )
-    contents = []
-    for code in codes:
-        contents.extend(listdir((data_dir / code).as_posix()))
     if as_four_char_ids:
-        return sorted([c[-4:] for c in contents])
-    return sorted(contents)
+        return sorted(c[-4:] for c in contents)
+    return list(contents)
+
+
+def _code_dir_stamps(
+    data_dir: str, codes: tuple[str, ...] | None
+) -> tuple[tuple[str, int], ...]:
+    """
+    Modification times of the two character code directories of
+    data_dir (only codes, if provided), which change whenever an
+    entry is added to or removed from them
+    """
+    if codes is None:
+        with scandir(data_dir) as entries:
+            return tuple(
+                sorted(
+                    (entry.name, entry.stat().st_mtime_ns)
+                    for entry in entries
+                    if entry.is_dir()
+                )
+            )
+    return tuple((code, stat(f"{data_dir}/{code}").st_mtime_ns) for code in codes)
+
+
+@lru_cache(maxsize=32)
+def _scan_local_contents(
+    data_dir: str, stamps: tuple[tuple[str, int], ...]
+) -> tuple[str, ...]:
+    """
+    Sorted names of the entries in the two character code directories
+    of data_dir. Several pipeline stages list the same directory, so
+    the listing is cached, keyed on the directory modification times
+    so that entries written since (by any process) are picked up.
+    """
+    contents: list[str] = []
+    for code, _ in stamps:
+        with scandir(f"{data_dir}/{code}") as entries:
+            contents.extend(entry.name for entry in entries)
+    return tuple(sorted(contents))
 
 
 def partition_batch_scores(*, partition_dir: Path, scores_dir: Path) -> None:
@@ -320,20 +445,23 @@ def partition_batch_scores(*, partition_dir: Path, scores_dir: Path) -> None:
     scores_dir : Path
         source directory for fragmented scores
     """
-    # collect the fragmented parquets
-    dfs = []
-    for pqt in scores_dir.glob("*.parquet"):
-        df = pd.read_parquet(pqt)
-        if not df.empty:
-            dfs.append(df)
-    if len(dfs):
-        df = pd.concat(dfs).reset_index(drop=True)
-        df.to_parquet(
+    # stream the fragmented parquets into the partitioned dataset
+    # batch by batch, rather than concatenating them all in memory
+    pqts = [pqt.as_posix() for pqt in scores_dir.glob("*.parquet")]
+    if len(pqts):
+        schema = schemas.PROTEIN_SIMILARITY_SCHEMA
+        ds.write_dataset(
+            ds.dataset(pqts, schema=schema, format="parquet"),
             partition_dir,
-            partition_cols=["metric", "similarity"],
-            index=False,
+            format="parquet",
+            partitioning=ds.partitioning(
+                pa.schema([schema.field("metric"), schema.field("similarity")]),
+                flavor="hive",
+            ),
+            # unique file names so that repeated batches add to the dataset
+            basename_template=f"{uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
             max_partitions=3939,
-            schema=schemas.PROTEIN_SIMILARITY_SCHEMA,
         )
 
 
@@ -380,7 +508,7 @@ def get_alns(
     return found
 
 
-def should_run_stage(stage: str, run: list[str], skip: list[str]) -> bool:
+def should_run_stage(stage: str, run: Collection[str], skip: Collection[str]) -> bool:
     """
     Compare function name to list of whitelisted / blacklisted
     stages to determine short-circuiting behavior for pipeline
@@ -390,10 +518,10 @@ def should_run_stage(stage: str, run: list[str], skip: list[str]) -> bool:
     ----------
     stage : str
         the stage in question
-    run : list[str]
-        list of stages to run
-    skip : list[str]
-        list of stages to skip
+    run : Collection[str]
+        stages to run
+    skip : Collection[str]
+        stages to skip
 
     Returns
     -------
@@ -411,39 +539,60 @@ def should_run_stage(stage: str, run: list[str], skip: list[str]) -> bool:
     return True
 
 
+def _flow_stages(pipe: Any) -> tuple[frozenset[str], frozenset[str]]:
+    """
+    The run / skip stages of a pipeline as frozensets, converted
+    once per flow config rather than on every stage call
+
+    Parameters
+    ----------
+    pipe : IngestPipeline
+        the pipeline whose config to read
+
+    Returns
+    -------
+    run, skip : tuple[frozenset[str], frozenset[str]]
+        the stages to run and to skip
+    """
+    flow = pipe.cfg.flow
+    cached = pipe.__dict__.get("_flow_stages")
+    if cached is None or cached[0] is not flow:
+        cached = (
+            flow,
+            frozenset(flow.run_specific_stages),
+            frozenset(flow.skip_specific_stages),
+        )
+        pipe.__dict__["_flow_stages"] = cached
+    return cached[1], cached[2]
+
+
 def ingest_flow_control(func: Callable[..., T]) -> Callable[..., T]:
     """
     Function decorator to apply for every stage
     in the IngestPipeline.
     """
+    # everything derived from the function name is fixed at decoration time
+    fname = func.__name__
+    is_scatter = fname.startswith("scatter_")
+    is_join = not is_scatter and fname.startswith("join_")
+    name = fname
+    if is_scatter:
+        name = fname.replace("scatter_", "", 1)
+    elif is_join:
+        name = fname.replace("join_", "", 1)
+    verb = "computing"
+    if is_join:
+        verb = "joining"
+    elif is_scatter:
+        verb = "producing"
+    prefix = f"{fname} {verb}"
 
     @wraps(func)
     def inner(pipe: Any, *args: Optional[list[str]], **kwargs: Any) -> Any:
-        is_scatter = False
-        is_join = False
-        name = func.__name__
-        if func.__name__.startswith("scatter_"):
-            is_scatter = True
-            name = func.__name__.replace("scatter_", "", 1)
-        elif func.__name__.startswith("join_"):
-            is_join = True
-            name = func.__name__.replace("join_", "", 1)
-        if should_run_stage(
-            name,
-            pipe.cfg.flow.run_specific_stages,
-            pipe.cfg.flow.skip_specific_stages,
-        ):
-            chunks = None
+        if should_run_stage(name, *_flow_stages(pipe)):
+            msg = prefix
             if len(args) and args[0] is not None:
-                chunks = len(args[0])
-            verb = "computing"
-            if is_join:
-                verb = "joining"
-            elif is_scatter:
-                verb = "producing"
-            msg = f"{func.__name__} {verb}"
-            if chunks is not None:
-                msg += f" {chunks} parts"
+                msg += f" {len(args[0])} parts"
             if not is_scatter:
                 LOG.info(msg)
             ret = func(pipe, *args, **kwargs)
@@ -451,7 +600,7 @@ def ingest_flow_control(func: Callable[..., T]) -> Callable[..., T]:
                 LOG.info(f"{msg} {len(ret)} chunks")  # type: ignore
             return ret
         else:
-            LOG.info(f"skipping {func.__name__}")
+            LOG.info(f"skipping {fname}")
         return [[]]
 
     return inner
@@ -461,6 +610,8 @@ def add_cluster_columns(*, index: pd.DataFrame) -> pd.DataFrame:
     """
     Add cluster columns to the annotation table
     """
+    from plinder.core.scores import query_clusters
+
     try:
         clusters = query_clusters(
             columns=[
@@ -471,7 +622,8 @@ def add_cluster_columns(*, index: pd.DataFrame) -> pd.DataFrame:
                 "cluster",
                 "directed",
             ],
-            filters=[("system_id", "in", set(index["system_id"]))],
+            # unique is hash-based in C, unlike building a python set
+            filters=[("system_id", "in", index["system_id"].unique().tolist())],
         )
     except Exception as e:
         LOG.error(f"Could not query clusters: {e}")
@@ -485,17 +637,15 @@ def add_cluster_columns(*, index: pd.DataFrame) -> pd.DataFrame:
         columns=["metric", "cluster", "directed", "threshold"],
         aggfunc="first",
     )
-    new_column_names = []
-    for metric, cluster, directed, threshold in clusters.columns:
-        if cluster == "components":
-            if directed == "True":
-                d = "strong__component"
-            else:
-                d = "weak__component"
-        else:
-            d = "community"
-        new_column_names.append(f"{metric}__{threshold}__{d}")
-    clusters.columns = new_column_names
+    # build the flattened names column-wise rather than per tuple
+    levels = clusters.columns.to_frame(index=False).astype(str).to_numpy(dtype=object)
+    metric, cluster, directed, threshold = levels.T
+    kind = np.where(
+        cluster == "components",
+        np.where(directed == "True", "strong__component", "weak__component"),
+        "community",
+    ).astype(object)
+    clusters.columns = metric + "__" + threshold + "__" + kind
     clusters.reset_index(inplace=True)
     return index.merge(clusters, on="system_id", how="left")
 
@@ -511,16 +661,16 @@ def add_aggregated_columns(*, index: pd.DataFrame) -> pd.DataFrame:
             + "_"
             + index["pli_qcov__100__strong__component"]
         )
-    index["biounit_num_ligands"] = index.groupby(["entry_pdb_id", "system_biounit_id"])[
-        "system_id"
-    ].transform("count")
-    index["biounit_num_unique_ccd_codes"] = index.groupby(
-        ["entry_pdb_id", "system_biounit_id"]
-    )["ligand_unique_ccd_code"].transform("nunique")
-    index["biounit_num_proper_ligands"] = index.groupby(
-        ["entry_pdb_id", "system_biounit_id"]
-    )["ligand_is_proper"].transform("sum")
-    for n in [
+    # group once per key and reuse the grouper for every aggregate
+    by_biounit = index.groupby(["entry_pdb_id", "system_biounit_id"])
+    index["biounit_num_ligands"] = by_biounit["system_id"].transform("count")
+    index["biounit_num_unique_ccd_codes"] = by_biounit[
+        "ligand_unique_ccd_code"
+    ].transform("nunique")
+    index["biounit_num_proper_ligands"] = by_biounit["ligand_is_proper"].transform(
+        "sum"
+    )
+    names = [
         "lipinski",
         "cofactor",
         "fragment",
@@ -530,29 +680,51 @@ def add_aggregated_columns(*, index: pd.DataFrame) -> pd.DataFrame:
         "covalent",
         "invalid",
         "ion",
-    ]:
-        index[f"system_ligand_has_{n}"] = index.groupby("system_id")[
-            f"ligand_is_{n}"
-        ].transform("any")
-    index["system_protein_chains_total_length"] = index[
-        "system_protein_chains_length"
-    ].apply(sum)
-    ccd_dict = (
-        index.groupby("system_id")["ligand_unique_ccd_code"]
-        .agg(lambda x: "-".join(sorted(set(x))))
-        .to_dict()
+    ]
+    system_ligand_has = (
+        index.groupby("system_id")[[f"ligand_is_{n}" for n in names]]
+        .transform("any")
+        .set_axis([f"system_ligand_has_{n}" for n in names], axis=1)
+    )
+    index[system_ligand_has.columns] = system_ligand_has
+    # sum the list column in one pass over its flattened values
+    lengths = pa.array(index["system_protein_chains_length"])
+    if pa.types.is_null(lengths.type):
+        # an empty or all-null column has no list type, nulls sum to 0
+        lengths = lengths.cast(pa.list_(pa.int64()))
+    values = lengths.flatten().to_numpy()
+    index["system_protein_chains_total_length"] = np.bincount(
+        pc.list_parent_indices(lengths).to_numpy(),
+        weights=values,
+        minlength=len(lengths),
+    ).astype(values.dtype)
+    index["system_unique_ccd_codes"] = index["system_id"].map(
+        _join_unique_ccd_codes(index)
     )
-    index["system_unique_ccd_codes"] = index["system_id"].map(ccd_dict)
-    ccd_proper_dict = (
-        index[index["ligand_is_proper"]]
-        .groupby("system_id")["ligand_unique_ccd_code"]
-        .agg(lambda x: "-".join(sorted(set(x))))
-        .to_dict()
+    index["system_proper_unique_ccd_codes"] = index["system_id"].map(
+        _join_unique_ccd_codes(index[index["ligand_is_proper"]])
     )
-    index["system_proper_unique_ccd_codes"] = index["system_id"].map(ccd_proper_dict)
     return index
 
 
+def _join_unique_ccd_codes(index: pd.DataFrame) -> pd.Series:
+    """
+    The sorted unique ccd codes of every system joined by "-"
+    """
+    # deduplicate and sort in bulk instead of a set and sort per system,
+    # systems with a single code (the vast majority) need no join at all
+    codes = index[["system_id", "ligand_unique_ccd_code"]].drop_duplicates()
+    codes = codes.sort_values(["system_id", "ligand_unique_ccd_code"])
+    multiple = codes["system_id"].duplicated(keep=False)
+    single = codes[~multiple].set_index("system_id")["ligand_unique_ccd_code"]
+    joined = (
+        codes[multiple]
+        .groupby("system_id", sort=False)["ligand_unique_ccd_code"]
+        .agg("-".join)
+    )
+    return pd.concat([single, joined])
+
+
 def create_index(*, data_dir: Path, force_update: bool = False) -> pd.DataFrame:
     """
     Create the index
@@ -561,13 +733,19 @@ def create_index(*, data_dir: Path, force_update: bool = False) -> pd.DataFrame:
     index.parent.mkdir(exist_ok=True, parents=True)
 
     if not index.exists() or force_update:
-        dfs = []
+        # concatenate in arrow and convert to pandas once, instead of
+        # materializing every file and then the concatenation in pandas
+        tables = []
         for i, path in enumerate((data_dir / "qc" / "index").glob("*")):
-            df = pd.read_parquet(path)
-            LOG.info(f"{i} {path.name} shape={df.shape}")
-            if not df.empty:
-                dfs.append(df)
-        df = pd.concat(dfs).reset_index(drop=True)
+            table = pq.read_table(path)
+            LOG.info(f"{i} {path.name} shape={table.shape}")
+            if table.num_rows:
+                tables.append(table)
+        df = (
+            pa.concat_tables(tables, promote_options="permissive")
+            .to_pandas(self_destruct=True, split_blocks=True)
+            .reset_index(drop=True)
+        )
         # TODO: remove these kludges after annotations are rerun
         key = "ligand_posebusters_internal_energy"
         df[key] = df[key].astype(bool)
@@ -688,7 +866,12 @@ def pred_file_from_link_id(
     # return chain_to_seqres[chain]
 
 
-def pack_linked_structures(data_dir: Path, code: str, structures: bool = True) -> None:
+def pack_linked_structures(
+    data_dir: Path,
+    code: str,
+    structures: bool = True,
+    system_ids: dict[str, list[str]] | None = None,
+) -> None:
     """
     Pack generated linked structures into a zip file for a particular
     two character code.
@@ -701,19 +884,30 @@ def pack_linked_structures(data_dir: Path, code: str, structures: bool = True) -
         two character code
     structures : bool, default=True
         if True, make structure archives
+    system_ids : dict[str, list[str]], default=None
+        staged system ids of this code per search_db, if already
+        known, to skip listing the full staging directories
     """
     (data_dir / "links").mkdir(exist_ok=True, parents=True)
     mode: Literal["r", "w"] = "w" if structures else "r"
+    # CIF text compresses well at the lowest deflate level, for a
+    # fraction of the CPU time of the default level
     with ZipFile(
-        data_dir / "links" / f"{code}.zip", mode, compression=ZIP_DEFLATED
+        data_dir / "links" / f"{code}.zip",
+        mode,
+        compression=ZIP_DEFLATED,
+        compresslevel=1,
     ) as archive:
         for search_db in ["apo", "pred"]:
             jsons = []
             root = data_dir / "linked_staging" / search_db
-            system_ids = [
-                system_id for system_id in listdir(root) if system_id[1:3] == code
-            ]
-            for system_id in system_ids:
+            if system_ids is None:
+                code_system_ids = [
+                    system_id for system_id in listdir(root) if system_id[1:3] == code
+                ]
+            else:
+                code_system_ids = system_ids.get(search_db, [])
+            for system_id in code_system_ids:
                 link_ids = listdir(f"{root}/{system_id}")
                 for link_id in link_ids:
                     link = f"{root}/{system_id}/{link_id}"
@@ -748,10 +942,32 @@ def mp_pack_linked_structures(*, data_dir: Path, structures: bool = True) -> Non
         plinder root dir
     """
 
+    codes = listdir(data_dir / "ingest")
+    # list the staging directories once here rather than once per code
+    system_ids: dict[str, dict[str, list[str]]] = {code: {} for code in codes}
+    for search_db in ["apo", "pred"]:
+        root = data_dir / "linked_staging" / search_db
+        with scandir(root) as entries:
+            for entry in entries:
+                code = entry.name[1:3]
+                if code in system_ids:
+                    system_ids[code].setdefault(search_db, []).append(entry.name)
+    # schedule the largest codes first to balance the workers
+    codes.sort(
+        key=lambda code: sum(len(ids) for ids in system_ids[code].values()),
+        reverse=True,
+    )
+    chunksize = max(1, len(codes) // (multiprocessing.cpu_count() * 4))
     with multiprocessing.get_context("spawn").Pool() as pool:
         pool.starmap(
             pack_linked_structures,
-            zip(repeat(data_dir), listdir(data_dir / "ingest"), repeat(structures)),
+            zip(
+                repeat(data_dir),
+                codes,
+                repeat(structures),
+                (system_ids[code] for code in codes),
+            ),
+            chunksize=chunksize,
         )
 
 
@@ -777,26 +993,43 @@ def consolidate_linked_scores(*, data_dir: Path) -> None:
     data_dir : Path
         plinder root dir
     """
+    import duckdb
+
+    keys = ["reference_system_id", "id"]
+    con = duckdb.connect()
     for search_db in ["apo", "pred"]:
         paths = list((data_dir / "links").glob(f"{search_db}_*.parquet"))
-        dfs = []
+        tables = []
         for path in paths:
-            df = pd.read_parquet(path)
-            if not df.empty:
-                dfs.append(df)
-        ndf = pd.concat(dfs)
-        odf = pd.read_parquet(
-            data_dir / "linked_staging" / f"{search_db}_links.parquet"
-        )
-        drop = list(
-            set(odf.columns.intersection(ndf.columns))
-            - set(["reference_system_id", "id"])
-        )
-        df = pd.merge(odf.drop(columns=drop), ndf, on=["reference_system_id", "id"])
-        (data_dir / "links" / f"kind={search_db}").mkdir(exist_ok=True, parents=True)
-        df.to_parquet(
-            data_dir / "links" / f"kind={search_db}" / "links.parquet", index=False
+            table = pq.read_table(path)
+            if table.num_rows:
+                tables.append(table)
+        ndf = pa.concat_tables(tables, promote_options="permissive")
+        odf = pq.read_table(data_dir / "linked_staging" / f"{search_db}_links.parquet")
+        drop = set(odf.column_names).intersection(ndf.column_names) - set(keys)
+        odf = odf.drop_columns(list(drop))
+        # join and write in duckdb (multi-threaded, straight from arrow)
+        # rather than materializing both sides and the result in pandas
+        con.register("odf", odf)
+        con.register("ndf", ndf)
+        target = data_dir / "links" / f"kind={search_db}" / "links.parquet"
+        target.parent.mkdir(exist_ok=True, parents=True)
+        # quotes in the path are escaped for the SQL string literal
+        quoted = str(target).replace("'", "''")
+        con.sql(
+            dedent(
+                f"""
+                    COPY
+                        (select * from odf join ndf using ({", ".join(keys)}))
+                    TO
+                        '{quoted}'
+                    (FORMAT PARQUET);
+                """
+            )
         )
+        con.unregister("odf")
+        con.unregister("ndf")
+    con.close()
 
 
 def rename_clusters(*, data_dir: Path) -> None:
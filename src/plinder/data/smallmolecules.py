@@ -3,15 +3,25 @@
 # This script contains all funcs related to small molecules.
 from __future__ import annotations
 
-from typing import Any, Optional
+import multiprocessing
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any, Optional, Sequence
+from uuid import uuid4
 
 import numpy as np
-from rdkit import Chem, DataStructs
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rdkit import Chem, DataStructs, rdBase
 from rdkit.Chem import AllChem, Descriptors, rdDepictor, rdFingerprintGenerator
 from rdkit.Chem.rdchem import Mol
 
 rdDepictor.SetPreferCoordGen(True)
 
+# below this many SMILES, starting worker processes costs more than it saves
+_MIN_PARALLEL_FPS = 10_000
+
 
 def nha(smi: str) -> int:
     try:
@@ -156,10 +166,189 @@ def mol2morgan_fp(
     return fp
 
 
+# maps a byte to the byte with its bits reversed, since the FPS text of a
+# bit vector lists the bits of each byte least significant first
+_REVERSED_BITS = np.packbits(
+    np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little"),
+    axis=1,
+).ravel()
+
+
+def _packed_morgan_fps(
+    smiles: Sequence[str], radius: int, nbits: int
+) -> np.ndarray[int, Any]:
+    mfpgen = rdFingerprintGenerator.GetMorganGenerator(radius=radius, fpSize=nbits)
+    mols = [Chem.MolFromSmiles(smi) for smi in smiles]
+    # fingerprint all molecules in one call and decode their hex text in
+    # bulk, rather than building and packing a numpy array per molecule
+    fps = mfpgen.GetFingerprints(mols)
+    text = "".join(DataStructs.BitVectToFPSText(fp) for fp in fps)
+    packed = np.frombuffer(bytes.fromhex(text), dtype=np.uint8)
+    reversed_bits: np.ndarray[int, Any] = _REVERSED_BITS[
+        packed.reshape(len(mols), nbits // 8)
+    ]
+    return reversed_bits
+
+
+def packed_morgan_fps(
+    smiles: Sequence[str],
+    radius: int = 2,
+    nbits: int = 2048,
+    num_processes: int | None = None,
+) -> np.ndarray[int, Any]:
+    """Compute Morgan fingerprints as a packed bit matrix
+    :param smiles: SMILES strings
+    :param radius: fingerprint radius
+    :param nbits: number of fingerprint bits
+    :param num_processes: number of processes, defaults to the cpu count;
+        small inputs are always fingerprinted in the calling process
+    :return: uint8 array of shape (len(smiles), nbits // 8), one bit per fp bit
+    """
+    if num_processes is None:
+        num_processes = multiprocessing.cpu_count()
+    if num_processes <= 1 or len(smiles) < _MIN_PARALLEL_FPS:
+        return _packed_morgan_fps(smiles, radius, nbits)
+    # SMILES parsing dominates and holds the GIL, so chunks go to processes
+    chunks = np.array_split(np.asarray(smiles, dtype=object), num_processes * 4)
+    with multiprocessing.get_context("spawn").Pool(num_processes) as p:
+        packed = p.starmap(
+            _packed_morgan_fps,
+            [(chunk.tolist(), radius, nbits) for chunk in chunks],
+        )
+    return np.concatenate(packed)
+
+
+class FingerprintCache:
+    """On-disk cache of packed Morgan fingerprints keyed by SMILES
+
+    Every run appends the fingerprints it had to compute as a new parquet
+    part, so SMILES seen in earlier runs are never fingerprinted again.
+    The RDKit version, radius and number of bits are part of the cache
+    directory, so entries from other settings are never mixed in.
+    """
+
+    def __init__(self, cache_dir: Path, radius: int = 2, nbits: int = 2048):
+        self.radius = radius
+        self.nbits = nbits
+        self.path = (
+            Path(cache_dir) / f"morgan_r{radius}_b{nbits}.rdkit-{rdBase.rdkitVersion}"
+        )
+
+    @staticmethod
+    def _key(smiles: str) -> bytes:
+        return blake2b(smiles.encode(), digest_size=16).digest()
+
+    def _load(self) -> tuple[pd.Index, np.ndarray[int, Any]]:
+        nbytes = self.nbits // 8
+        if not any(self.path.glob("*.parquet")):
+            return pd.Index([]), np.empty((0, nbytes), dtype=np.uint8)
+        table = pq.read_table(self.path)
+        fps = table["fp"].combine_chunks()
+        # fixed size binary values are one contiguous buffer
+        packed = np.frombuffer(fps.buffers()[1], dtype=np.uint8)
+        packed = packed[fps.offset * nbytes : (fps.offset + len(fps)) * nbytes]
+        keys = pd.Index(table["key"].to_pylist())
+        # concurrent runs may have stored the same fingerprints twice
+        unique = ~keys.duplicated()
+        return keys[unique], packed.reshape(-1, nbytes)[unique]
+
+    def packed_morgan_fps(
+        self, smiles: Sequence[str], num_processes: int | None = None
+    ) -> np.ndarray[int, Any]:
+        """Packed fingerprints of smiles, computing only the cache misses
+        :param smiles: SMILES strings
+        :param num_processes: passed to packed_morgan_fps for the misses
+        :return: uint8 array of shape (len(smiles), nbits // 8)
+        """
+        keys = [self._key(smi) for smi in smiles]
+        cached_keys, cached = self._load()
+        positions = cached_keys.get_indexer(keys)
+        packed = np.empty((len(keys), self.nbits // 8), dtype=np.uint8)
+        hits = positions >= 0
+        packed[hits] = cached[positions[hits]]
+        missing = np.flatnonzero(~hits)
+        if len(missing):
+            computed = packed_morgan_fps(
+                [smiles[i] for i in missing],
+                radius=self.radius,
+                nbits=self.nbits,
+                num_processes=num_processes,
+            )
+            packed[missing] = computed
+            self.path.mkdir(parents=True, exist_ok=True)
+            table = pa.table(
+                {
+                    "key": pa.array([keys[i] for i in missing], pa.binary(16)),
+                    "fp": pa.array(
+                        [row.tobytes() for row in computed],
+                        pa.binary(self.nbits // 8),
+                    ),
+                }
+            )
+            # dot files are ignored when reading, so a partially
+            # written part is never picked up by a concurrent run
+            name = f"part-{uuid4()}.parquet"
+            pq.write_table(table, self.path / f".{name}")
+            (self.path / f".{name}").replace(self.path / name)
+        return packed
+
+
+def _unpack_bits(packed: np.ndarray[int, Any]) -> np.ndarray[float, Any]:
+    return np.unpackbits(packed, axis=1).astype(np.float32)
+
+
+# number of set bits of every byte value
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def _bit_counts(packed: np.ndarray[int, Any]) -> np.ndarray[float, Any]:
+    # counted on the packed bytes, without unpacking them
+    counts: np.ndarray[float, Any] = _POPCOUNT[packed].sum(axis=1, dtype=np.float64)
+    return counts
+
+
+def _packed_tanimoto_max(
+    packed1: np.ndarray[int, Any],
+    packed2: np.ndarray[int, Any],
+    block1: int = 4096,
+    block2: int = 1024,
+) -> np.ndarray[float, Any]:
+    """Maximum Tanimoto similarity of every row of packed2 to the rows of packed1
+
+    Intersections are computed as a float32 matrix product of the unpacked
+    bits, so the work is done by BLAS rather than per pair. Both sides are
+    processed in tiles of block1 x block2 rows, keeping only a running
+    maximum per row, so neither the full similarity matrix nor either
+    full unpacked fingerprint matrix is ever materialized.
+    """
+    packed2, inverse = np.unique(packed2, axis=0, return_inverse=True)
+    counts2 = _bit_counts(packed2)
+    best = np.zeros(len(packed2))
+    for start1 in range(0, len(packed1), block1):
+        bits1 = _unpack_bits(packed1[start1 : start1 + block1])
+        counts1 = _bit_counts(packed1[start1 : start1 + block1])
+        for start2 in range(0, len(packed2), block2):
+            stop2 = start2 + block2
+            inter = (_unpack_bits(packed2[start2:stop2]) @ bits1.T).astype(np.float64)
+            union = counts2[start2:stop2, None] + counts1 - inter
+            sim = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+            np.maximum(best[start2:stop2], sim.max(axis=1), out=best[start2:stop2])
+    # map the maxima of the unique fingerprints back to every row
+    maxima: np.ndarray[float, Any] = best[inverse.reshape(-1)]
+    return maxima
+
+
 def tanimoto_maxsim_matrix(
-    fp_list1: list[Any], fp_list2: list[Any]
+    fp_list1: list[Any] | np.ndarray[int, Any],
+    fp_list2: list[Any] | np.ndarray[int, Any],
 ) -> np.ndarray[float]:
-    """Calculate maximum similarity for the fingerprint second list to the first fingerprint lists"""
+    """Calculate maximum similarity for the fingerprint second list to the first fingerprint lists
+
+    Either lists of RDKit fingerprints or packed bit matrices as returned
+    by packed_morgan_fps are accepted
+    """
+    if isinstance(fp_list1, np.ndarray) and isinstance(fp_list2, np.ndarray):
+        return _packed_tanimoto_max(fp_list1, fp_list2) * 100
     similarity_matrix = [
         np.max(DataStructs.BulkTanimotoSimilarity(fp, fp_list1)) for fp in fp_list2
     ]
@@ -448,6 +448,7 @@ class Scorer:
                         data_dir=data_dir,
                         pdb_ids=entries_to_load,
                         load_for_scoring=True,
+                        skip_validation=True,
                     )
                 )
 
@@ -2,14 +2,119 @@
 # Distributed under the terms of the Apache License 2.0
 from __future__ import annotations
 
+import types
+import typing
 from functools import cached_property
 from pathlib import Path
-from typing import Any, Generator
+from typing import Annotated, Any, Callable, Generator, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
+
+M = TypeVar("M", bound="DocBaseModel")
+
+_FIELD_BUILDERS: dict[tuple[type, str], Callable[[Any], Any]] = {}
+_DESCRIPTIONS: dict[type, dict[str, tuple[str | None, str | None]]] = {}
+_HAS_VALIDATORS: dict[type, bool] = {}
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _has_validators(cls: type[BaseModel]) -> bool:
+    """
+    Whether a model defines its own (field or model) validators, which
+    model_construct would silently skip
+    """
+    if cls not in _HAS_VALIDATORS:
+        decorators = cls.__pydantic_decorators__
+        _HAS_VALIDATORS[cls] = bool(
+            decorators.field_validators
+            or decorators.model_validators
+            or decorators.validators
+            or decorators.root_validators
+        )
+    return _HAS_VALIDATORS[cls]
+
+
+def _value_builder(annotation: Any) -> Callable[[Any], Any]:
+    """
+    Map a field annotation to a function converting its JSON value,
+    validating with pydantic only what can not be taken over as is
+    """
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin in (typing.Union, types.UnionType) and type(None) in args:
+        non_null = [arg for arg in args if arg is not type(None)]
+        if len(non_null) == 1:
+            builder = _value_builder(non_null[0])
+            if builder is _identity:
+                return _identity
+            return lambda value: None if value is None else builder(value)
+    elif isinstance(annotation, type) and issubclass(annotation, DocBaseModel):
+        return annotation.model_construct_nested
+    elif annotation in (str, int, bool, Any):
+        return _identity
+    elif annotation is float:
+        return float
+    elif origin is list and len(args) == 1:
+        item = _value_builder(args[0])
+        if item is _identity:
+            return _identity
+        return lambda value: [item(v) for v in value]
+    elif origin is dict and len(args) == 2 and args[0] is str:
+        item = _value_builder(args[1])
+        if item is _identity:
+            return _identity
+        return lambda value: {k: item(v) for k, v in value.items()}
+    # sets, tuples, non-string keys, ... need proper validation
+    return TypeAdapter(annotation).validate_python
 
 
 class DocBaseModel(BaseModel):
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs: Any) -> None:
+        super().__pydantic_init_subclass__(**kwargs)
+        # the documented fields and properties are fixed once the class exists
+        _DESCRIPTIONS[cls] = cls._build_descriptions_and_types()
+
+    @classmethod
+    def model_construct_nested(cls: type[M], data: dict[str, Any]) -> M:
+        """
+        Build a model from trusted data, e.g. JSON written by model_dump_json,
+        without validating all of it. Nested models are constructed recursively,
+        JSON-native values are taken over as is and only fields that need
+        coercion (annotated constraints, sets, tuples, ...) are validated.
+        Models that define field or model validators are fully validated
+        with model_validate instead, so that their validators still run.
+        Values that model_validate would reject are not detected otherwise.
+
+        Parameters
+        ----------
+        data : dict[str, Any]
+            the parsed JSON of the model
+
+        Returns
+        -------
+        model : DocBaseModel
+            the constructed model
+        """
+        if _has_validators(cls):
+            return cls.model_validate(data)
+        values = {}
+        for name, field in cls.model_fields.items():
+            if name not in data:
+                continue
+            key = (cls, name)
+            if key not in _FIELD_BUILDERS:
+                if field.metadata:
+                    annotated = Annotated[(field.annotation, *field.metadata)]  # type: ignore
+                    _FIELD_BUILDERS[key] = TypeAdapter(annotated).validate_python
+                else:
+                    _FIELD_BUILDERS[key] = _value_builder(field.annotation)
+            values[name] = _FIELD_BUILDERS[key](data[name])
+        return cls.model_construct(**values)
+
     @classmethod
     def get_descriptions_and_types(cls) -> dict[str, tuple[str | None, str | None]]:
         """
@@ -20,10 +125,21 @@ class DocBaseModel(BaseModel):
         dict[str, str | None]
             A dictionary mapping attribute and property names to their descriptions and types.
         """
+        if cls not in _DESCRIPTIONS:
+            _DESCRIPTIONS[cls] = cls._build_descriptions_and_types()
+        return dict(_DESCRIPTIONS[cls])
+
+    @classmethod
+    def _build_descriptions_and_types(
+        cls,
+    ) -> dict[str, tuple[str | None, str | None]]:
         descriptions = {}
         annotations = cls.__annotations__
         for name, value in cls.model_fields.items():
-            descriptions[name] = (value.description, annotations[name])
+            descriptions[name] = (
+                value.description,
+                annotations.get(name, value.annotation),
+            )
 
         for name, prop in cls.__dict__.items():
             if isinstance(prop, cached_property) or isinstance(prop, property):
@@ -1,5 +1,6 @@
 # Copyright (c) 2024, Plinder Development Team
 # Distributed under the terms of the Apache License 2.0
+from itertools import repeat
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Optional
 
@@ -8,7 +9,7 @@ import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 from rdkit import Chem
-from rdkit.Chem import AllChem
+from rdkit.Chem import AllChem, rdFingerprintGenerator
 from scipy.spatial.distance import cdist
 
 from plinder.core.utils import schemas
@@ -20,6 +21,11 @@ if TYPE_CHECKING:
 
 LOG = setup_logger(__name__)
 
+# fingerprints computed along with the ligand batches, see save_ligand_batch
+PACKED_ECFP4_COL = "ligand_ecfp4_packed"
+PACKED_ECFP4_RADIUS = 2
+PACKED_ECFP4_NBITS = 1024
+
 
 def get_ecfp_fingerprint(
     smiles: str, radius: int, nbits: int
@@ -28,10 +34,41 @@ def get_ecfp_fingerprint(
         mol = Chem.MolFromSmiles(smiles)
         fp = AllChem.GetMorganFingerprintAsBitVect(mol, radius, nBits=nbits)
         return np.array(fp)
-    except:
+    except Exception:
         return None
 
 
+def get_packed_ecfp_fingerprints(
+    smiles: pd.Series, radius: int = 2, nbits: int = 1024
+) -> pd.Series:
+    """
+    ECFP fingerprints of smiles packed into nbits / 8 bytes, or None
+    where no fingerprint could be computed. Each unique smiles is only
+    fingerprinted once.
+
+    Parameters
+    ----------
+    smiles : pd.Series
+        smiles to fingerprint
+    radius : int, default=2
+        morgan radius
+    nbits : int, default=1024
+        fingerprint size
+    """
+    generator = rdFingerprintGenerator.GetMorganGenerator(radius=radius, fpSize=nbits)
+    packed: dict[str, bytes | None] = {}
+    for smi in smiles.unique():
+        try:
+            fp = generator.GetFingerprintAsNumPy(Chem.MolFromSmiles(smi))
+        except Exception:
+            # invalid smiles fail to parse into a molecule
+            packed[smi] = None
+            continue
+        packed[smi] = np.packbits(fp).tobytes()
+    fingerprints: pd.Series = smiles.map(packed)
+    return fingerprints
+
+
 def load_ligands_from_entry(
     *,
     entry: "Entry",
@@ -100,8 +137,17 @@ def load_ligands_from_entry(
 def compute_ligand_fingerprints(
     *, data_dir: Path, split_char: str = "__", radius: int = 2, nbits: int = 1024
 ) -> None:
-    ligands = (
-        pd.read_parquet(data_dir / "ligands").drop_duplicates().reset_index(drop=True)
+    ligands = pd.read_parquet(data_dir / "ligands")
+    # the fingerprint is derived from the smiles, leave it out of the
+    # duplicate check (it is missing in batches written before it existed)
+    ligands = ligands.drop_duplicates(
+        subset=[col for col in ligands.columns if col != PACKED_ECFP4_COL]
+    ).reset_index(drop=True)
+    # fingerprints stored with the ligand batches are re-used if they match
+    use_packed = (
+        PACKED_ECFP4_COL in ligands.columns
+        and radius == PACKED_ECFP4_RADIUS
+        and nbits == PACKED_ECFP4_NBITS
     )
     for col in ligands.columns:
         nunique = ligands[col].nunique()
@@ -110,6 +156,7 @@ def compute_ligand_fingerprints(
     ligands_unique = (
         ligands[ligands["inchikeys"] != ""][
             ["inchikeys", "ligand_rdkit_canonical_smiles"]
+            + ([PACKED_ECFP4_COL] if use_packed else [])
         ]
         .drop_duplicates(subset="inchikeys")
         .sort_values(by="inchikeys")
@@ -123,15 +170,23 @@ def compute_ligand_fingerprints(
     missing_inchi = ligands_unique[ligands_unique["number_id_by_inchikeys"] <= -1]
     LOG.info(f"ligands missing inchikeys: {len(missing_inchi.index)}")
     ligands_unique = ligands_unique[ligands_unique["number_id_by_inchikeys"] > -1]
+    packed = ligands_unique.pop(PACKED_ECFP4_COL) if use_packed else None
+    ligands = ligands.drop(columns=PACKED_ECFP4_COL, errors="ignore")
     output_dir = data_dir / "fingerprints"
     output_dir.mkdir(exist_ok=True, parents=True)
     ligands_unique.to_parquet(output_dir / "ligands_per_inchikey.parquet", index=False)
 
     LOG.info(f"computing ECFP fingerprints with radius={radius} nbits={nbits}")
-    ligands_unique["ECFP4"] = ligands_unique["ligand_rdkit_canonical_smiles"].apply(
-        get_ecfp_fingerprint,
-        radius=radius,
-        nbits=nbits,
+    fps = repeat(None) if packed is None else packed
+    ligands_unique["ECFP4"] = pd.Series(
+        [
+            np.unpackbits(np.frombuffer(fp, dtype=np.uint8))
+            if isinstance(fp, bytes)
+            else get_ecfp_fingerprint(smiles, radius, nbits)
+            for smiles, fp in zip(ligands_unique["ligand_rdkit_canonical_smiles"], fps)
+        ],
+        index=ligands_unique.index,
+        dtype=object,
     )
     if ligands_unique["ECFP4"].isnull().any():
         raise ValueError(f"found {ligands_unique['ECFP4'].isnull().sum()}")
@@ -2,15 +2,22 @@
 # Distributed under the terms of the Apache License 2.0
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from tqdm import tqdm
 
-from plinder.core.scores.index import query_index
 from plinder.core.scores.protein import cross_similarity as protein_cross_similarity
+from plinder.core.scores.query import FILTER, FILTERS, make_query, sql
+from plinder.core.utils import cpl
+from plinder.core.utils.config import get_config
 from plinder.core.utils.log import setup_logger
 from plinder.data import smallmolecules
 
@@ -40,22 +47,53 @@ STRATIFICATION_LABELS = [
 ]
 
 
+def query_index_table(*, columns: list[str], filters: FILTERS) -> pa.Table:
+    """
+    Query the index database into an arrow table, without the split
+    assignment and pandas conversion done by query_index
+    """
+    cfg = get_config()
+    dataset = cpl.get_plinder_path(rel=f"{cfg.data.index}/{cfg.data.index_file}")
+    query = make_query(dataset=dataset, columns=columns, filters=filters)
+    assert query is not None
+    table: pa.Table = sql(query).fetch_arrow_table()
+    return table
+
+
+def write_sorted_parquet(df: pd.DataFrame, output_file: Path) -> None:
+    """
+    Write a frame sorted by system_id, so that the row group statistics
+    are tight enough for filtered reads to skip most row groups
+    """
+    table = pa.Table.from_pandas(
+        df.sort_values("system_id", kind="stable"), preserve_index=False
+    )
+    pq.write_table(
+        table,
+        output_file,
+        compression="zstd",
+        use_dictionary=True,
+        row_group_size=256_000,
+        write_statistics=True,
+    )
+
+
 def compute_protein_max_similarities(
     left: set[str], right: set[str], metric: str, output_file: Path
-) -> None:
+) -> pd.DataFrame:
     LOG.info(
         f"compute_protein_max_similarities: Computing max similarities for {metric}"
     )
-    protein_cross_similarity(
+    df = protein_cross_similarity(
         query_systems=left,
         target_systems=right,
         metric=metric,
-    ).rename(
-        columns={"query_system": "system_id", "target_system": "train_system_id"}
-    ).to_parquet(output_file, index=False)
+    ).rename(columns={"query_system": "system_id", "target_system": "train_system_id"})
+    write_sorted_parquet(df, output_file)
     LOG.info(
         f"compute_protein_max_similarities: Done computing max similarities for {metric}"
     )
+    return df
 
 
 def compute_ligand_max_similarities(
@@ -64,23 +102,33 @@ def compute_ligand_max_similarities(
     train_label: str,
     test_label: str,
     output_file: Path,
-) -> None:
-    if "fp" not in df.columns:
-        smiles_fp_dict = {
-            smi: smallmolecules.mol2morgan_fp(smi)
-            for smi in df["ligand_rdkit_canonical_smiles"].drop_duplicates().to_list()
-        }
-        df["fp"] = df["ligand_rdkit_canonical_smiles"].map(smiles_fp_dict)
-
-    df_test = df.loc[df[split_label] == test_label][["system_id", "fp"]].copy()
-
+    fingerprint_cache_dir: Path | None = None,
+) -> pd.DataFrame:
+    is_test = (df[split_label] == test_label).to_numpy()
+    is_train = (df[split_label] == train_label).to_numpy()
+    df_test = df.loc[is_test, ["system_id"]].copy()
+    if "fp" in df.columns:
+        train_fps = df.loc[is_train, "fp"].to_list()
+        test_fps = df.loc[is_test, "fp"].to_list()
+    else:
+        # fingerprint every unique SMILES once into a packed bit matrix
+        # and refer to its rows, rather than boxing one object per row
+        codes, smiles = pd.factorize(
+            df["ligand_rdkit_canonical_smiles"], use_na_sentinel=False
+        )
+        if fingerprint_cache_dir is None:
+            fps = smallmolecules.packed_morgan_fps(smiles)
+        else:
+            cache = smallmolecules.FingerprintCache(fingerprint_cache_dir)
+            fps = cache.packed_morgan_fps(smiles)
+        train_fps = fps[np.unique(codes[is_train])]
+        test_fps = fps[codes[is_test]]
     df_test["tanimoto_similarity_max"] = smallmolecules.tanimoto_maxsim_matrix(
-        df.loc[df[split_label] == train_label]["fp"].to_list(),
-        df_test["fp"].to_list(),
-    )
-    df_test.drop("fp", axis=1).groupby("system_id").agg("max").reset_index().to_parquet(
-        output_file, index=False
+        train_fps, test_fps
     )
+    df_test = df_test.groupby("system_id").agg("max").reset_index()
+    write_sorted_parquet(df_test, output_file)
+    return df_test
 
 
 @dataclass
@@ -126,6 +174,8 @@ class StratifiedTestSet:
             columns=["system_id"] + list(SIMILARITY_METRICS)
         )
     )
+    fingerprint_cache_dir: Path | None = None
+    _index_table: pa.Table | None = field(default=None, init=False, repr=False)
 
     @classmethod
     def from_split(
@@ -136,6 +186,7 @@ class StratifiedTestSet:
         train_label: str = "train",
         test_label: str = "test",
         overwrite: bool = False,
+        fingerprint_cache_dir: Path | None = None,
     ) -> "StratifiedTestSet":
         if split_file.name.endswith(".csv"):
             split_df = pd.read_csv(split_file)
@@ -151,30 +202,45 @@ class StratifiedTestSet:
             split_label=split_label,
             train_label=train_label,
             test_label=test_label,
+            fingerprint_cache_dir=fingerprint_cache_dir,
         )
         data.output_dir.mkdir(exist_ok=True)
         data.compute_train_test_max_similarity(overwrite=overwrite)
         data.assign_test_set_quality()
         data.stratify_test_set()
-        data.max_similarities.to_parquet(data.output_dir / f"{test_label}_set.parquet")
+        write_sorted_parquet(
+            data.max_similarities, data.output_dir / f"{test_label}_set.parquet"
+        )
         return data
 
     def stratify_test_set(self) -> None:
+        # compare and combine one metric column at a time into reused
+        # buffers, rather than materializing a (systems, metrics) copy
+        # and a boolean array of the same shape for every label
+        n_systems = len(self.max_similarities)
+        below = np.empty(n_systems, dtype=bool)
+        # system ids are unique per row, so label counts are mask sums
+        passes = self.max_similarities["passes_quality"].to_numpy()
         for label, metric_list in self.similarity_combinations.items():
-            self.max_similarities[label] = np.logical_and.reduce(
-                [
-                    self.max_similarities[metric] < self.similarity_thresholds[metric]
-                    for metric in metric_list
-                ]
-            )
+            novel = np.ones(n_systems, dtype=bool)
+            for metric in metric_list:
+                np.less(
+                    self.max_similarities[metric].to_numpy(),
+                    self.similarity_thresholds[metric],
+                    out=below,
+                )
+                np.logical_and(novel, below, out=novel)
+            self.max_similarities[label] = novel
             LOG.info(
-                f'stratify_test_set: Found {self.max_similarities[self.max_similarities[label]]["system_id"].nunique()} systems labelled {label} ({self.max_similarities[self.max_similarities[label] & self.max_similarities["passes_quality"]]["system_id"].nunique()} passing quality)'
+                f"stratify_test_set: Found {np.count_nonzero(novel)} systems labelled {label} ({np.count_nonzero(novel & passes)} passing quality)"
             )
-        self.max_similarities["not_novel"] = np.logical_and.reduce(
-            [~self.max_similarities[label] for label in self.similarity_combinations]
-        )
+        not_novel = np.ones(n_systems, dtype=bool)
+        for label in self.similarity_combinations:
+            np.logical_not(self.max_similarities[label].to_numpy(), out=below)
+            np.logical_and(not_novel, below, out=not_novel)
+        self.max_similarities["not_novel"] = not_novel
         LOG.info(
-            f'stratify_test_set: Found {self.max_similarities[self.max_similarities["not_novel"]]["system_id"].nunique()} systems labelled not_novel ({self.max_similarities[self.max_similarities["not_novel"] & self.max_similarities["passes_quality"]]["system_id"].nunique()} passing quality)'
+            f"stratify_test_set: Found {np.count_nonzero(not_novel)} systems labelled not_novel ({np.count_nonzero(not_novel & passes)} passing quality)"
         )
 
     def get_filename(self, metric: str) -> Path:
@@ -183,122 +249,161 @@ class StratifiedTestSet:
             / f"max_similarities__{self.test_label}_vs_{self.train_label}__{metric}.parquet"
         )
 
+    def get_split_systems(self) -> tuple[set[str], set[str]]:
+        """Train and test system ids, from one pass over the split labels"""
+        labels = self.split_df[self.split_label].to_numpy()
+        system_ids = self.split_df["system_id"].to_numpy()
+        return (
+            set(system_ids[labels == self.train_label]),
+            set(system_ids[labels == self.test_label]),
+        )
+
+    def get_index_table(self, systems: set[str]) -> pa.Table:
+        """
+        Ligand and quality columns of the index for the given systems,
+        read once and shared by the ligand similarities and the test set
+        quality assignment
+        """
+        table = self._index_table
+        if table is None:
+            table = query_index_table(
+                columns=[
+                    "system_id",
+                    "ligand_rdkit_canonical_smiles",
+                    "ligand_is_ion",
+                    "ligand_is_artifact",
+                    "system_pass_validation_criteria",
+                ],
+                filters=[FILTER(("system_id", "in", systems))],
+            )
+            self._index_table = table
+        return table
+
+    def compute_metric_similarity(
+        self, metric: str, left: set[str], right: set[str]
+    ) -> pd.DataFrame:
+        if metric == "tanimoto_similarity_max":
+            table = self.get_index_table(left.union(right))
+            # like the == False filters, null flags drop the ligand
+            table = table.filter(
+                pc.and_(
+                    pc.equal(table["ligand_is_ion"], False),
+                    pc.equal(table["ligand_is_artifact"], False),
+                )
+            )
+            df = table.select(["system_id", "ligand_rdkit_canonical_smiles"])
+            df = df.to_pandas().merge(self.split_df, on="system_id", how="left")
+            return compute_ligand_max_similarities(
+                df,
+                self.split_label,
+                self.train_label,
+                self.test_label,
+                self.get_filename(metric),
+                fingerprint_cache_dir=self.fingerprint_cache_dir,
+            )
+        return compute_protein_max_similarities(
+            left, right, metric, self.get_filename(metric)
+        )
+
     def compute_train_test_max_similarity(
         self, overwrite: bool = False
     ) -> pd.DataFrame:
-        left, right = (
-            set(
-                self.split_df[self.split_df[self.split_label] == self.train_label][
-                    "system_id"
-                ]
-            ),
-            set(
-                self.split_df[self.split_df[self.split_label] == self.test_label][
-                    "system_id"
-                ]
-            ),
-        )
+        left, right = self.get_split_systems()
         LOG.info(
             f"compute_train_test_max_similarity: Found {len(left)} train and {len(right)} test systems"
         )
-        for metric in tqdm(SIMILARITY_METRICS):
-            if overwrite or not (self.get_filename(metric)).exists():
-                if metric == "tanimoto_similarity_max":
-                    df = query_index(
-                        columns=[
-                            "system_id",
-                            "ligand_rdkit_canonical_smiles",
-                        ],
-                        filters=[  # type: ignore
-                            ("system_id", "in", left.union(right)),
-                            ("ligand_is_ion", "==", False),
-                            ("ligand_is_artifact", "==", False),
-                        ],
-                        splits=["*"],
-                    ).drop(columns=["split"])
-                    df = df.merge(self.split_df, on="system_id", how="left")
-                    compute_ligand_max_similarities(
-                        df,
-                        self.split_label,
-                        self.train_label,
-                        self.test_label,
-                        self.get_filename(metric),
-                    )
-                else:
-                    compute_protein_max_similarities(
-                        left, right, metric, self.get_filename(metric)
-                    )
-
-        per_metric_similarities = []
+        todo = [
+            metric
+            for metric in SIMILARITY_METRICS
+            if overwrite or not self.get_filename(metric).exists()
+        ]
+        # the metrics are independent and each writes its own file; the
+        # work is mostly in duckdb and BLAS, which release the GIL
+        computed: dict[str, pd.DataFrame] = {}
+        if len(todo):
+            with ThreadPoolExecutor(max_workers=min(8, len(todo))) as executor:
+                futures = {
+                    executor.submit(
+                        self.compute_metric_similarity, metric, left, right
+                    ): metric
+                    for metric in todo
+                }
+                for future in tqdm(as_completed(futures), total=len(futures)):
+                    computed[futures[future]] = future.result()
+
+        # only read the test systems and the metric itself, letting
+        # parquet skip the row groups that hold no test systems
+        in_right = ds.field("system_id").isin(pa.array(list(right), type=pa.string()))
+        max_per_metric = {}
         for metric in SIMILARITY_METRICS:
-            df = pd.read_parquet(self.get_filename(metric))
-            df = df.loc[df.groupby("system_id")[metric].idxmax()]
-            df = df[df["system_id"].isin(right)].reset_index(drop=True)
-            if "train_system_id" in df.columns:
-                df = df.drop(columns="train_system_id")
-            per_metric_similarities.append(df.set_index("system_id"))
-        self.max_similarities = pd.concat(
-            per_metric_similarities, join="outer", axis=1
-        ).reset_index()
+            if metric in computed:
+                # freshly computed frames are used as is, not read back
+                df = computed.pop(metric)
+                df = df.loc[df["system_id"].isin(right), ["system_id", metric]]
+            else:
+                df = pd.read_parquet(
+                    self.get_filename(metric),
+                    columns=["system_id", metric],
+                    filters=in_right,
+                )
+            max_per_metric[metric] = df.groupby("system_id", sort=False, observed=True)[
+                metric
+            ].max()
+        found = pd.unique(
+            np.concatenate([s.index.to_numpy() for s in max_per_metric.values()])
+        )
         LOG.info(
-            f'compute_train_test_max_similarity: Got max similarities for {self.max_similarities["system_id"].nunique()} systems'
+            f"compute_train_test_max_similarity: Got max similarities for {len(found)} systems"
         )
-        systems_with_similarities = set(self.max_similarities["system_id"])
-        extra_rows = []
-        for system in right.difference(systems_with_similarities):
-            extra_row = {"system_id": system}
-            for metric in SIMILARITY_METRICS:
-                extra_row[metric] = np.nan
-            extra_rows.append(extra_row)
-        if len(extra_rows):
+        missing = len(right) - len(found)
+        if missing:
             LOG.info(
-                f"compute_train_test_max_similarity: Adding nan similarities for {len(extra_rows)} systems"
-            )
-            self.max_similarities = pd.concat(
-                [self.max_similarities, pd.DataFrame(extra_rows)]
+                f"compute_train_test_max_similarity: Adding nan similarities for {missing} systems"
             )
-        self.max_similarities = self.max_similarities.fillna(0)
+        # reindexing with a fill value adds the test systems without any
+        # similarity while each metric keeps its stored dtype (int8 percents
+        # for the protein scores), without a round trip through float64
+        index = pd.Index(sorted(right), name="system_id")
+        self.max_similarities = pd.DataFrame(
+            {
+                metric: s.reindex(index, fill_value=0).fillna(0)
+                for metric, s in max_per_metric.items()
+            }
+        ).reset_index()
 
     def assign_test_set_quality(self) -> None:
-        df = query_index(
-            filters=[
-                (
-                    "system_id",
-                    "in",
-                    set(
-                        self.split_df[
-                            self.split_df[self.split_label] == self.test_label
-                        ]["system_id"]
-                    ),
-                )
-            ],  # type: ignore
-            columns=[
-                "system_id",
-                "system_pass_validation_criteria",
-            ],
-            splits=["*"],
-        ).drop(columns=["split"])
-        quality = dict(
-            zip(df["system_id"], df["system_pass_validation_criteria"].fillna(False))
-        )
-        missing_systems = set(
-            self.max_similarities[~self.max_similarities["system_id"].isin(quality)][
-                "system_id"
-            ]
+        table = self._index_table
+        if table is not None:
+            # re-use the rows read for the ligand similarities
+            self._index_table = None
+        else:
+            table = query_index_table(
+                columns=["system_id", "system_pass_validation_criteria"],
+                filters=[FILTER(("system_id", "in", self.get_split_systems()[1]))],
+            )
+        # stay in arrow until the lookup series is built
+        passes = pc.fill_null(table["system_pass_validation_criteria"], False)
+        quality = pd.Series(
+            passes.to_numpy(zero_copy_only=False).astype(bool),
+            index=table["system_id"].to_numpy(zero_copy_only=False),
         )
+        quality = quality[~quality.index.duplicated(keep="last")]
+        # one membership pass, reused for counting and for filtering
+        in_index = self.max_similarities["system_id"].isin(quality.index).to_numpy()
+        missing_systems = set(self.max_similarities["system_id"].to_numpy()[~in_index])
         if len(missing_systems):
             LOG.info(
                 f"Discarding {len(missing_systems)} as they are not in the plindex"
             )
-            self.max_similarities = self.max_similarities[
-                self.max_similarities["system_id"].isin(quality)
-            ].reset_index(drop=True)
-        self.max_similarities["passes_quality"] = self.max_similarities[
-            "system_id"
-        ].map(lambda x: quality.get(x, False))
+            self.max_similarities = self.max_similarities[in_index].reset_index(
+                drop=True
+            )
+        self.max_similarities["passes_quality"] = (
+            self.max_similarities["system_id"].map(quality).fillna(False).astype(bool)
+        )
         LOG.info(
-            f'assign_test_set_quality: Found {self.max_similarities[self.max_similarities["passes_quality"]]["system_id"].nunique()} '
-            f'out of {self.max_similarities["system_id"].nunique()} systems passing quality'
+            f"assign_test_set_quality: Found {int(self.max_similarities['passes_quality'].sum())} "
+            f"out of {len(self.max_similarities)} systems passing quality"
         )
 
 
@@ -339,6 +444,12 @@ def stratify_cmd(args: list[str] | None = None) -> None:
         action="store_true",
         help="Overwrite max similarity files",
     )
+    parser.add_argument(
+        "--fingerprint_cache_dir",
+        type=Path,
+        default=None,
+        help="Path to folder where ligand fingerprints are cached across runs",
+    )
 
     ns, unknown_args = parser.parse_known_args(args=args)
     if len(unknown_args):
@@ -351,6 +462,7 @@ def stratify_cmd(args: list[str] | None = None) -> None:
         train_label=ns.train_label,
         test_label=ns.test_label,
         overwrite=ns.overwrite,
+        fingerprint_cache_dir=ns.fingerprint_cache_dir,
     )
 
 
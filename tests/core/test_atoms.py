@@ -8,10 +8,14 @@ from biotite.structure.atoms import AtomArray
 from plinder.core.index.system import PlinderSystem
 from plinder.core.structure import vendored as atoms
 from plinder.core.structure.atoms import (
+    _chain_index_map,
+    _one_hot_encode_stack,
+    _stack_atom_array_features,
     atom_array_from_cif_file,
     generate_input_conformer,
 )
 from plinder.core.structure.models import BackboneDefinition
+from plinder.core.utils import constants as pc
 
 
 def test_pdb_loader(pdb_5a7w_hydrogen):
@@ -153,3 +157,69 @@ def test_structure_partially_resolved_ligand(read_plinder_mount):
         3,
         28,
     )
+
+
+def _one_hot_encode_per_element(stack, feature_dict, unknown_name_filler):
+    # the per-element encoding _one_hot_encode_stack replaced
+    feat_array = []
+    unknown_name_filler_value = feature_dict[unknown_name_filler]
+    for per_chain_feat in stack:
+        feat = np.zeros((len(per_chain_feat), len(set(feature_dict.values()))))
+        for index, value in enumerate(per_chain_feat):
+            feat[index, feature_dict.get(value, unknown_name_filler_value)] = 1.0
+        feat_array.append(feat)
+    return feat_array
+
+
+@pytest.mark.parametrize(
+    "stack, feature_dict, unknown_name_filler",
+    [
+        ([["C", "N", "O", "S"], [], ["Zn", "C", "Q"]], pc.ELE2NUM, "other"),
+        (
+            [np.array(["ALA", "GLY", "XYZ"]), ["A", "W", "UNK", "B"]],
+            pc.AA_TO_INDEX,
+            "UNK",
+        ),
+    ],
+)
+def test_one_hot_encode_stack(stack, feature_dict, unknown_name_filler):
+    result = _one_hot_encode_stack(stack, feature_dict, unknown_name_filler)
+    expect = _one_hot_encode_per_element(stack, feature_dict, unknown_name_filler)
+    assert len(result) == len(expect)
+    for r, e in zip(result, expect):
+        np.testing.assert_array_equal(r, e)
+
+
+def test_one_hot_encode_stack_changed_vocabulary():
+    feature_dict = {"a": 0, "b": 1, "other": 2}
+    stack = [["a", "b", "c"]]
+    _one_hot_encode_stack(stack, feature_dict, "other")
+    # the same dict object with another vocabulary
+    feature_dict["c"] = 3
+    result = _one_hot_encode_stack(stack, feature_dict, "other")
+    expect = _one_hot_encode_per_element(stack, feature_dict, "other")
+    np.testing.assert_array_equal(result[0], expect[0])
+
+
+@pytest.mark.parametrize(
+    "chain_order",
+    [
+        ["A", "B", "C", "D", "E"],
+        ["E", "C", "A"],
+        # chains without atoms and repeated chains
+        ["B", "Z", "B", "D"],
+    ],
+)
+def test_stack_atom_array_features_chain_order(cif_atom_array, chain_order):
+    rng = np.random.default_rng(0)
+    # also interleave the atoms, so that no chain is contiguous
+    shuffled = cif_atom_array[rng.permutation(len(cif_atom_array))]
+    for arr in [cif_atom_array, shuffled]:
+        chain_index_map = _chain_index_map(arr, chain_order)
+        for feat in ["res_name", "coord"]:
+            result = _stack_atom_array_features(arr, feat, chain_order, chain_index_map)
+            # the per-chain masks _chain_index_map replaced
+            expect = [getattr(arr[arr.chain_id == ch], feat) for ch in chain_order]
+            assert len(result) == len(expect)
+            for r, e in zip(result, expect):
+                np.testing.assert_array_equal(r, e)
@@ -117,3 +117,23 @@ def test_multi_query_protein_similarity(read_plinder_mount):
     )
     assert len(df.index)
     assert all(k in df.columns for k in filter_criteria)
+
+
+def test_query_links_bulk(read_plinder_mount):
+    system_ids = ["4dd7__1__1.A__1.B", "1avd__1__1.A__1.C", "19hc__1__1.A__1.I"]
+    links = scores.query_links_bulk(system_ids=system_ids)
+    assert list(links) == system_ids
+    assert len(links["4dd7__1__1.A__1.B"].index) == 7
+    assert len(links["1avd__1__1.A__1.C"].index) == 5
+    assert not len(links["19hc__1__1.A__1.I"].index)
+    assert "kind" in links["19hc__1__1.A__1.I"].columns
+
+
+def test_query_linked_system_ids(read_plinder_mount):
+    from plinder.core.scores.links import empty_links
+
+    linked = scores.query_linked_system_ids()
+    assert linked == {"4dd7__1__1.A__1.B", "1avd__1__1.A__1.C"}
+    empty = empty_links()
+    assert not len(empty.index)
+    assert list(empty.columns) == list(scores.query_links().columns)
@@ -1,6 +1,8 @@
+import pickle
 from pathlib import Path
 
 import numpy as np
+import pandas as pd
 import pytest
 from plinder.core import index
 
@@ -70,3 +72,64 @@ def test_plinder_structure(read_plinder_mount):
     assert len(holo_struc.protein_atom_array)
     assert holo_struc.ligand_sdfs is not None
     assert len(holo_struc.ligand_sdfs)
+
+
+def test_plinder_system_pickle(read_plinder_mount):
+    system_id = "19hc__1__1.A_1.B__1.V_1.X_1.Y"
+    s = index.PlinderSystem(system_id=system_id)
+    assert s.archive is not None
+    loaded = pickle.loads(pickle.dumps(s))
+    assert loaded.system_id == system_id
+    assert loaded.archive == s.archive
+    assert loaded.system == s.system
+
+
+def test_plinder_system_best_linked_structures_ids(read_plinder_mount):
+    s = index.PlinderSystem(system_id="4dd7__1__1.A__1.B")
+    assert s.best_linked_structures_ids() == {"apo": ["2vb1_A"]}
+    assert s.best_linked_structures_ids(topn=2) == {
+        "apo": ["2vb1_A", "8rt2__1__1.A__1.B_1.C_1.D_1.E"]
+    }
+    s = index.PlinderSystem(system_id="19hc__1__1.A__1.I")
+    assert s.best_linked_structures_ids() == {}
+
+
+def test_plinder_system_alternate_structures(read_plinder_mount, tmp_path):
+    s = index.PlinderSystem(system_id="1avd__1__1.A__1.C")
+    ids = ["1avd_A", "2avd_A", "P02701_A"]
+    kinds = ["apo", "apo", "pred"]
+    for link_id in ids:
+        (tmp_path / f"{link_id}.cif").write_bytes(Path(s.receptor_cif).read_bytes())
+    s.linked_archive = tmp_path
+    s._linked_structures = pd.DataFrame({"id": ids, "kind": kinds})
+    structures = s.alternate_structures
+    assert list(structures) == ids
+    for link_id, kind in zip(ids, kinds):
+        structure = structures[link_id]
+        assert structure.structure_type == kind
+        assert structure.protein_path == tmp_path / f"{link_id}.cif"
+        assert structure.protein_atom_array is not None
+        assert len(structure.protein_atom_array)
+
+
+def test_unpack_zip_concurrently(entry_zip, tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from zipfile import ZipFile
+
+    from plinder.core.utils import unpack
+
+    path = tmp_path / entry_zip.name
+    path.write_bytes(entry_zip.read_bytes())
+    extracted = []
+    extractall = ZipFile.extractall
+
+    def counting_extractall(self, *args, **kwargs):
+        extracted.append(self.filename)
+        return extractall(self, *args, **kwargs)
+
+    monkeypatch.setattr(ZipFile, "extractall", counting_extractall)
+    # e.g. holo links of systems in the same zip, resolved by threads
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(unpack._unpack_zip, [path] * 8))
+    assert len(extracted) == 1
+    assert (tmp_path / f"{path.stem}_done").is_file()
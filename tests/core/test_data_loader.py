@@ -1,7 +1,133 @@
 # Copyright (c) 2024, Plinder Development Team
 # Distributed under the terms of the Apache License 2.0
+import numpy as np
+import torch
+from plinder.core.loader.utils import (
+    _maybe_fast_stack,
+    collate_complex,
+    nested_pad_and_stack,
+    pad_and_stack,
+)
+
+
 def test_data_loader(read_plinder_mount):
     from plinder.core.loader import PlinderDataset
 
     ds = PlinderDataset(split="removed", use_alternate_structures=False)
     assert len(ds[0])
+
+
+def test_data_loader_system_cache(read_plinder_mount):
+    from plinder.core.loader import PlinderDataset
+
+    ds = PlinderDataset(
+        split="removed",
+        use_alternate_structures=False,
+        featurizer=None,
+        system_cache_size=1,
+    )
+    first = ds._system_ids[0]
+    assert ds._get_system(first) is ds._get_system(first)
+    ds._get_system(ds._system_ids[1])
+    assert list(ds._systems) == [ds._system_ids[1]]
+
+
+def test_data_loader_links_are_lazy(read_plinder_mount):
+    from plinder.core.loader import PlinderDataset
+
+    ds = PlinderDataset(split="removed", featurizer=None)
+    assert ds._links is None
+    assert len(ds[0])
+    assert ds._links is not None
+
+
+def test_data_loader_per_chain_featurizer(read_plinder_mount):
+    from plinder.core.loader import PlinderDataset
+    from plinder.core.loader.dataset import per_chain_featurizer
+    from plinder.core.loader.utils import collate_batch
+
+    padded = PlinderDataset(split="removed", use_alternate_structures=False)
+    per_chain = PlinderDataset(
+        split="removed",
+        use_alternate_structures=False,
+        featurizer=per_chain_featurizer,
+    )
+    assert isinstance(per_chain[0]["features_and_coords"]["protein_coordinates"], list)
+    expected = collate_batch([padded[0]])["features_and_coords"]
+    collated = collate_batch([per_chain[0]])["features_and_coords"]
+    assert expected.keys() == collated.keys()
+    for name, feat in expected.items():
+        assert torch.equal(feat, collated[name]), name
+
+
+def test_data_loader_cache_dir(read_plinder_mount, tmp_path):
+    from plinder.core.loader import PlinderDataset
+
+    ds = PlinderDataset(
+        split="removed", use_alternate_structures=False, cache_dir=tmp_path
+    )
+    item = ds[0]
+    assert len(list(tmp_path.glob(f"*/{item['system_id']}.pkl"))) == 1
+    cached = ds[0]
+    assert cached["system_id"] == item["system_id"]
+    assert cached["features_and_coords"].keys() == item["features_and_coords"].keys()
+    # items of another featurizer are cached separately
+    other = PlinderDataset(
+        split="removed",
+        use_alternate_structures=False,
+        featurizer=None,
+        cache_dir=tmp_path,
+    )
+    assert other[0]["features_and_coords"] is None
+    assert len(list(tmp_path.glob(f"*/{item['system_id']}.pkl"))) == 2
+
+
+def test_nested_pad_and_stack():
+    tensors = [torch.rand(4, 4, 3), torch.rand(7, 7, 3)]
+    padded = nested_pad_and_stack(tensors, value=-100)
+    assert padded.shape == (2, 7, 7, 3)
+    assert torch.equal(padded, pad_and_stack(tensors, dim=0, value=-100))
+
+
+def test_pad_to_multiple_of():
+    tensors = [torch.rand(4, 3), torch.rand(9, 3)]
+    padded = nested_pad_and_stack(tensors, value=-100, multiple_of=8)
+    assert padded.shape == (2, 16, 3)
+    assert torch.equal(
+        padded, pad_and_stack(tensors, dims_to_pad=[0], value=-100, multiple_of=8)
+    )
+    assert (padded[0, 4:] == -100).all()
+
+
+def test_collate_complex_per_chain_arrays():
+    chains = [
+        [np.random.rand(4, 3), np.random.rand(9, 3)],
+        [np.random.rand(5, 3)],
+    ]
+    collated = collate_complex([{"feat": sample} for sample in chains], multiple_of=8)[
+        "feat"
+    ]
+    padded = collate_complex(
+        [
+            {
+                "feat": nested_pad_and_stack(
+                    [torch.from_numpy(c) for c in sample], multiple_of=8
+                )
+            }
+            for sample in chains
+        ]
+    )["feat"]
+    assert collated.shape == (2, 2, 16, 3)
+    assert torch.equal(collated, padded)
+
+
+def test_maybe_fast_stack():
+    for arrays in [
+        [np.random.rand(8, 3), np.random.rand(8, 3)],
+        [np.random.rand(5, 3), np.random.rand(5, 3)],
+        [np.random.rand(4, 3), np.random.rand(9, 3)],
+    ]:
+        assert torch.equal(
+            _maybe_fast_stack(arrays, multiple_of=8),
+            nested_pad_and_stack([torch.from_numpy(a) for a in arrays], multiple_of=8),
+        )
@@ -2,6 +2,8 @@
 # Distributed under the terms of the Apache License 2.0
 import pytest
 from plinder.data.pipeline import utils
+from plinder.data.utils.annotations.utils import DocBaseModel
+from pydantic import field_validator, model_validator
 
 _ENTRY = """
 {{
@@ -82,6 +84,52 @@ def test_load_entries_from_zips(kwargs, expect, tmp_path, entry_zip):
     assert len(entries) == expect
 
 
+def test_load_entries_from_zips_skip_validation(tmp_path, entry_zip):
+    zip_dir = tmp_path / "entries"
+    zip_dir.mkdir(parents=True)
+    (zip_dir / entry_zip.name).write_bytes(entry_zip.read_bytes())
+    validated = utils.load_entries_from_zips(data_dir=tmp_path)
+    constructed = utils.load_entries_from_zips(data_dir=tmp_path, skip_validation=True)
+    assert validated.keys() == constructed.keys()
+    for pdb_id, entry in validated.items():
+        assert entry.model_dump_json() == constructed[pdb_id].model_dump_json()
+
+
+def test_model_construct_nested_runs_validators():
+    class Inner(DocBaseModel):
+        name: str
+
+        @field_validator("name")
+        @classmethod
+        def upper(cls, value: str) -> str:
+            return value.upper()
+
+    class Middle(DocBaseModel):
+        count: int = 0
+
+        @model_validator(mode="before")
+        @classmethod
+        def default_count(cls, data: dict) -> dict:
+            return {"count": len(data.get("names", [])), **data}
+
+    class Outer(DocBaseModel):
+        inner: Inner
+        inners: list[Inner]
+        middle: Middle
+        value: float
+
+    data = {
+        "inner": {"name": "a"},
+        "inners": [{"name": "b"}, {"name": "c"}],
+        "middle": {"names": ["x", "y"]},
+        "value": 1,
+    }
+    constructed = Outer.model_construct_nested(data)
+    assert constructed.inner.name == "A"
+    assert constructed.middle.count == 2
+    assert constructed.model_dump_json() == Outer.model_validate(data).model_dump_json()
+
+
 @pytest.mark.parametrize(
     "contents",
     [
@@ -90,7 +138,12 @@ def test_load_entries_from_zips(kwargs, expect, tmp_path, entry_zip):
     ],
 )
 def test_hash_contents(contents):
-    utils.hash_contents(contents)
+    from hashlib import md5
+    from json import dumps
+
+    # identifiers are used in file names, so they must stay stable
+    expect = md5(dumps(sorted(contents)).encode("utf8")).hexdigest()
+    assert utils.hash_contents(contents) == expect
 
 
 @pytest.mark.parametrize(
@@ -125,3 +178,209 @@ def test_get_local_contents_pdb_ids(tmp_path):
     b.write_text(_ENTRY(pdb_id="bbbb"))
     contents = utils.get_local_contents(data_dir=tmp_path, as_four_char_ids=True)
     assert contents == ["aaaa", "bbbb"]
+
+
+def test_get_local_contents_sees_new_entries(tmp_path):
+    (tmp_path / "aa" / "aaaa").mkdir(parents=True)
+    assert utils.get_local_contents(data_dir=tmp_path) == ["aaaa"]
+    # written after the first listing, e.g. by another process
+    (tmp_path / "aa" / "baaa").mkdir()
+    (tmp_path / "bb" / "bbbb").mkdir(parents=True)
+    assert utils.get_local_contents(data_dir=tmp_path) == ["aaaa", "baaa", "bbbb"]
+    assert utils.get_local_contents(data_dir=tmp_path, two_char_codes=["aa"]) == [
+        "aaaa",
+        "baaa",
+    ]
+
+
+def test_consolidate_linked_scores(test_dir, tmp_path):
+    import pandas as pd
+
+    links = pd.read_parquet(
+        test_dir / "plinder" / "mount" / "links" / "kind=apo" / "links.parquet"
+    ).drop(columns=["kind"])
+    keys = ["reference_system_id", "id"]
+    # a quote in the path must not break the COPY statement
+    data_dir = tmp_path / "it's"
+    (data_dir / "links").mkdir(parents=True)
+    (data_dir / "linked_staging").mkdir(parents=True)
+    odf = links[keys + ["target_id", "sort_score", "pocket_fident"]]
+    ndf = links[keys + ["protein_fident_weighted_sum", "pocket_fident"]]
+    for search_db in ["apo", "pred"]:
+        staging = data_dir / "linked_staging" / f"{search_db}_links.parquet"
+        odf.to_parquet(staging, index=False)
+        # split over several files, one of them empty
+        for i, part in enumerate([ndf.iloc[:5], ndf.iloc[5:], ndf.iloc[:0]]):
+            part.to_parquet(
+                data_dir / "links" / f"{search_db}_{i}.parquet", index=False
+            )
+    utils.consolidate_linked_scores(data_dir=data_dir)
+    # the output of the pandas merge the duckdb join replaced
+    expect = pd.merge(odf.drop(columns=["pocket_fident"]), ndf, on=keys)
+    expect = expect.sort_values(keys, ignore_index=True)
+    for search_db in ["apo", "pred"]:
+        result = pd.read_parquet(
+            data_dir / "links" / f"kind={search_db}" / "links.parquet"
+        )
+        result = result.sort_values(keys, ignore_index=True)
+        pd.testing.assert_frame_equal(result, expect)
+
+
+_AGGREGATED_COLUMNS = [
+    "uniqueness",
+    "biounit_num_ligands",
+    "biounit_num_unique_ccd_codes",
+    "biounit_num_proper_ligands",
+    *(
+        f"system_ligand_has_{n}"
+        for n in [
+            "lipinski",
+            "cofactor",
+            "fragment",
+            "oligo",
+            "artifact",
+            "other",
+            "covalent",
+            "invalid",
+            "ion",
+        ]
+    ),
+    "system_protein_chains_total_length",
+    "system_unique_ccd_codes",
+    "system_proper_unique_ccd_codes",
+]
+
+
+def _add_aggregated_columns_per_group(index):
+    # the per-group implementation add_aggregated_columns replaced
+    index["uniqueness"] = (
+        index["system_id_no_biounit"] + "_" + index["pli_qcov__100__strong__component"]
+    )
+    biounit = ["entry_pdb_id", "system_biounit_id"]
+    index["biounit_num_ligands"] = index.groupby(biounit)["system_id"].transform(
+        "count"
+    )
+    index["biounit_num_unique_ccd_codes"] = index.groupby(biounit)[
+        "ligand_unique_ccd_code"
+    ].transform("nunique")
+    index["biounit_num_proper_ligands"] = index.groupby(biounit)[
+        "ligand_is_proper"
+    ].transform("sum")
+    for name in _AGGREGATED_COLUMNS[4:13]:
+        n = name.replace("system_ligand_has_", "")
+        index[name] = index.groupby("system_id")[f"ligand_is_{n}"].transform("any")
+    index["system_protein_chains_total_length"] = index[
+        "system_protein_chains_length"
+    ].apply(sum)
+    for name, df in [
+        ("system_unique_ccd_codes", index),
+        ("system_proper_unique_ccd_codes", index[index["ligand_is_proper"]]),
+    ]:
+        codes = (
+            df.groupby("system_id")["ligand_unique_ccd_code"]
+            .agg(lambda x: "-".join(sorted(set(x))))
+            .to_dict()
+        )
+        index[name] = index["system_id"].map(codes)
+    return index
+
+
+@pytest.mark.parametrize("rows", [slice(None), slice(0)])
+def test_add_aggregated_columns(rows, test_dir, monkeypatch):
+    import pandas as pd
+
+    # clusters are not part of the comparison
+    monkeypatch.setattr(utils, "add_cluster_columns", lambda *, index: index)
+    index = pd.read_parquet(
+        test_dir / "plinder" / "mount" / "index" / "annotation_table.parquet"
+    )
+    index = index.drop(columns=_AGGREGATED_COLUMNS).iloc[rows]
+    result = utils.add_aggregated_columns(index=index.copy())
+    expect = _add_aggregated_columns_per_group(index.copy())
+    # summing an empty object column with apply left it as object
+    key = "system_protein_chains_total_length"
+    expect[key] = expect[key].astype(result[key].dtype)
+    pd.testing.assert_frame_equal(result, expect)
+
+
+def test_add_aggregated_columns_null_chain_lengths(test_dir, monkeypatch):
+    import pandas as pd
+
+    monkeypatch.setattr(utils, "add_cluster_columns", lambda *, index: index)
+    index = pd.read_parquet(
+        test_dir / "plinder" / "mount" / "index" / "annotation_table.parquet"
+    )
+    index = index.drop(columns=_AGGREGATED_COLUMNS)
+    expect = index["system_protein_chains_length"].apply(sum).to_list()
+    index.loc[::2, "system_protein_chains_length"] = None
+    expect[::2] = [0] * len(expect[::2])
+    result = utils.add_aggregated_columns(index=index.copy())
+    assert result["system_protein_chains_total_length"].to_list() == expect
+    index["system_protein_chains_length"] = None
+    result = utils.add_aggregated_columns(index=index)
+    assert (result["system_protein_chains_total_length"] == 0).all()
+
+
+def test_partition_batch_scores(tmp_path):
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from plinder.core.utils import schemas
+
+    schema = schemas.PROTEIN_SIMILARITY_SCHEMA
+    scores = pd.DataFrame(
+        {
+            "query_system": [f"query_{i}" for i in range(12)],
+            "target_system": [f"target_{i % 5}" for i in range(12)],
+            "protein_mapping": "A:B",
+            "mapping": "1.A:1.B",
+            "protein_mapper": ["foldseek", "mmseqs"] * 6,
+            "source": "both",
+            "metric": ["pli_qcov", "protein_lddt", "pocket_fident"] * 4,
+            "similarity": [50, 100, 100, 95] * 3,
+        }
+    )
+
+    def write_batch(name, parts):
+        scores_dir = tmp_path / name
+        scores_dir.mkdir()
+        for i, part in enumerate(parts):
+            table = pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+            pq.write_table(table, scores_dir / f"{i}.parquet")
+        return scores_dir
+
+    # the second batch must add to the dataset written by the first
+    batches = [
+        write_batch("a", [scores.iloc[:4], scores.iloc[:0], scores.iloc[4:7]]),
+        write_batch("b", [scores.iloc[7:]]),
+    ]
+    for scores_dir in batches:
+        utils.partition_batch_scores(
+            partition_dir=tmp_path / "partitions", scores_dir=scores_dir
+        )
+        # the pandas writer partition_batch_scores replaced
+        dfs = [pd.read_parquet(pqt) for pqt in scores_dir.glob("*.parquet")]
+        df = pd.concat(df for df in dfs if not df.empty)
+        df.reset_index(drop=True).to_parquet(
+            tmp_path / "expect",
+            partition_cols=["metric", "similarity"],
+            index=False,
+            schema=schema,
+        )
+    written = sorted(
+        path.parent.relative_to(tmp_path / "partitions")
+        for path in (tmp_path / "partitions").rglob("*.parquet")
+    )
+    expect_written = sorted(
+        path.parent.relative_to(tmp_path / "expect")
+        for path in (tmp_path / "expect").rglob("*.parquet")
+    )
+    assert written == expect_written
+    # reading the partitions back as the downstream join step does
+    result = pd.read_parquet(tmp_path / "partitions")
+    result = result.sort_values("query_system", ignore_index=True)
+    expect = pd.read_parquet(tmp_path / "expect")
+    expect = expect.sort_values("query_system", ignore_index=True)
+    # dictionary categories are ordered by first occurrence in the files
+    pd.testing.assert_frame_equal(result, expect, check_categorical=False)
+    assert result["query_system"].to_list() == sorted(scores["query_system"])
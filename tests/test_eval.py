@@ -294,3 +294,134 @@ def test_evaluate_stratify_plot_cmds(prediction_csv, mock_cpl_eval):
     assert (
         Path(prediction_csv.parent) / "plots" / "delta_lDDT_PLI_topn1.html"
     ).exists()
+
+
+def _max_similarities_per_metric(split_df, scores, index_table, thresholds, combos):
+    # the per-metric loop StratifiedTestSet replaced
+    from plinder.data import smallmolecules
+
+    right = set(split_df.loc[split_df["split"] == "test", "system_id"])
+    index = index_table.to_pandas()
+    ligands = index[~index["ligand_is_ion"] & ~index["ligand_is_artifact"]]
+    df = ligands[["system_id", "ligand_rdkit_canonical_smiles"]].merge(
+        split_df, on="system_id", how="left"
+    )
+    df["fp"] = df["ligand_rdkit_canonical_smiles"].map(smallmolecules.mol2morgan_fp)
+    df_test = df.loc[df["split"] == "test"][["system_id", "fp"]].copy()
+    df_test["tanimoto_similarity_max"] = smallmolecules.tanimoto_maxsim_matrix(
+        df.loc[df["split"] == "train"]["fp"].to_list(), df_test["fp"].to_list()
+    )
+    scores = {
+        **scores,
+        "tanimoto_similarity_max": df_test.drop(columns="fp")
+        .groupby("system_id")
+        .agg("max")
+        .reset_index(),
+    }
+    per_metric = []
+    for metric, df in scores.items():
+        df = df.loc[df.groupby("system_id")[metric].idxmax()]
+        df = df[df["system_id"].isin(right)].drop(
+            columns="train_system_id", errors="ignore"
+        )
+        per_metric.append(df.set_index("system_id"))
+    result = pd.concat(per_metric, join="outer", axis=1).reset_index()
+    extra = sorted(right.difference(result["system_id"]))
+    result = pd.concat([result, pd.DataFrame({"system_id": extra})]).fillna(0)
+    quality = dict(
+        zip(
+            index["system_id"],
+            index["system_pass_validation_criteria"].astype("boolean").fillna(False),
+        )
+    )
+    result = result[result["system_id"].isin(quality)].reset_index(drop=True)
+    result["passes_quality"] = result["system_id"].map(quality).astype(bool)
+    for label, metrics in combos.items():
+        result[label] = np.logical_and.reduce(
+            [result[metric] < thresholds[metric] for metric in metrics]
+        )
+    result["not_novel"] = np.logical_and.reduce([~result[label] for label in combos])
+    return result
+
+
+def test_stratified_test_set_matches_per_metric_loop(tmp_path, monkeypatch):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from plinder.eval.docking import stratify_test_set
+
+    rng = np.random.default_rng(0)
+    train = [f"train_{i}" for i in range(20)]
+    test = [f"test_{i}" for i in range(15)]
+    split_df = pd.DataFrame(
+        {"system_id": train + test, "split": ["train"] * 20 + ["test"] * 15}
+    )
+    # the last test systems have no protein similarities at all
+    scores = {
+        metric: pd.DataFrame(
+            {
+                "system_id": rng.choice(test[:12], 30),
+                "train_system_id": rng.choice(train, 30),
+                metric: rng.integers(0, 101, 30).astype(np.int8),
+            }
+        )
+        for metric in stratify_test_set.SIMILARITY_METRICS[:-1]
+    }
+    # train systems only have the first three ligands, so test systems
+    # with the other two have novel ligands
+    smiles = ["CCO", "c1ccccc1O", "CC(=O)Nc1ccc(O)cc1", "c1ccncc1", "OCC(O)CO"]
+    ligands = [smiles[i % 3] for i in range(20)] + [smiles[i % 5] for i in range(14)]
+    # one test system is not in the index and is discarded, every third
+    # system has an extra ion that is left out of the ligand similarities
+    systems = train + test[:14]
+    ions = systems[::3]
+    index_table = pa.table(
+        {
+            "system_id": systems + ions,
+            "ligand_rdkit_canonical_smiles": ligands + ["[Na+]"] * len(ions),
+            "ligand_is_ion": [False] * len(systems) + [True] * len(ions),
+            "ligand_is_artifact": [False] * (len(systems) + len(ions)),
+            "system_pass_validation_criteria": rng.choice(
+                [True, False, None], len(systems) + len(ions)
+            ),
+        }
+    )
+    queries = []
+
+    def query_index_table(*, columns, filters):
+        queries.append(columns)
+        [(_, _, ids)] = filters
+        table = index_table.select(columns)
+        return table.filter(pc.is_in(table["system_id"], pa.array(ids)))
+
+    monkeypatch.setattr(stratify_test_set, "query_index_table", query_index_table)
+    monkeypatch.setattr(
+        stratify_test_set,
+        "protein_cross_similarity",
+        lambda *, query_systems, target_systems, metric: scores[metric].rename(
+            columns={"system_id": "query_system", "train_system_id": "target_system"}
+        ),
+    )
+    data = stratify_test_set.StratifiedTestSet(split_df=split_df, output_dir=tmp_path)
+    data.compute_train_test_max_similarity()
+    computed = data.max_similarities.copy()
+    data.assign_test_set_quality()
+    data.stratify_test_set()
+    # the ligand similarities and the quality share a single index read
+    assert len(queries) == 1
+    # a second run reads back the metric files written by the first
+    reread = stratify_test_set.StratifiedTestSet(split_df=split_df, output_dir=tmp_path)
+    reread.compute_train_test_max_similarity()
+    pd.testing.assert_frame_equal(reread.max_similarities, computed)
+    for metric in scores:
+        assert data.max_similarities[metric].dtype == np.int8
+    expect = _max_similarities_per_metric(
+        split_df,
+        scores,
+        index_table,
+        data.similarity_thresholds,
+        data.similarity_combinations,
+    )
+    result = data.max_similarities.sort_values("system_id", ignore_index=True)
+    expect = expect.sort_values("system_id", ignore_index=True)
+    # the protein scores were upcast to float64 by the nan filling
+    pd.testing.assert_frame_equal(result, expect[result.columns], check_dtype=False)
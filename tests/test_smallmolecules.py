@@ -2,21 +2,33 @@
 # Distributed under the terms of the Apache License 2.0
 import numpy as np
 from plinder.data.smallmolecules import (
+    FingerprintCache,
     NumHAcceptors,
     NumHDonors,
     containC,
     fcsp3,
     get_ecfp_fingerprint,
+    mol2morgan_fp,
     mw,
     n_ring,
     n_ro_bonds,
     neutralize_mol,
     nha,
+    packed_morgan_fps,
     rdkit_valid,
     smil2inchikey,
     smil2nochiral_nocharge,
+    tanimoto_maxsim_matrix,
 )
 
+_SMILES = [
+    "CC(=O)OC1=CC=CC=C1C(=O)O",
+    "c1ccccc1O",
+    "CCN(CC)CC",
+    "CC(=O)Nc1ccc(O)cc1",
+    "C1CCCCC1",
+]
+
 
 def test_smallmolecules():
     smiles = "CC(=O)OC1=CC=CC=C1C(=O)O"
@@ -70,3 +82,27 @@ def test_smallmolecules():
         ),
         np.nonzero(get_ecfp_fingerprint(smiles)),
     )
+
+
+def test_packed_tanimoto_maxsim_matrix():
+    train, test = _SMILES[:3], _SMILES[2:] + ["CCO"]
+    expected = tanimoto_maxsim_matrix(
+        [mol2morgan_fp(smi) for smi in train],
+        [mol2morgan_fp(smi) for smi in test],
+    )
+    packed = tanimoto_maxsim_matrix(packed_morgan_fps(train), packed_morgan_fps(test))
+    assert np.allclose(packed, expected)
+    assert packed[0] == 100
+
+
+def test_fingerprint_cache(tmp_path):
+    cache = FingerprintCache(tmp_path)
+    first = cache.packed_morgan_fps(_SMILES[:3])
+    assert len(list(cache.path.glob("*.parquet"))) == 1
+    both = cache.packed_morgan_fps(_SMILES)
+    assert np.array_equal(both[:3], first)
+    assert np.array_equal(both, packed_morgan_fps(_SMILES))
+    # only the two misses were written in the second part
+    assert len(list(cache.path.glob("*.parquet"))) == 2
+    cache.packed_morgan_fps(_SMILES[::-1])
+    assert len(list(cache.path.glob("*.parquet"))) == 2